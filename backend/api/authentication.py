@@ -0,0 +1,103 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """
+    Кэш токенов. При заданном TOKEN_CACHE_ALIAS токены хранятся только
+    во внешнем общем кэше, чтобы сброс в одном процессе сразу
+    действовал во всех. Иначе используется ограниченный по размеру
+    LRU-кэш в памяти процесса с временем жизни TOKEN_CACHE_LOCAL_TTL.
+    """
+    shared_prefix = 'auth:token:'
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._lock = threading.Lock()
+
+    def _shared(self):
+        alias = settings.TOKEN_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def get(self, key):
+        shared = self._shared()
+        if shared is not None:
+            return shared.get(self.shared_prefix + key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                self._remove(key)
+        return None
+
+    def set(self, key, value):
+        shared = self._shared()
+        if shared is not None:
+            shared.set(
+                self.shared_prefix + key, value, settings.TOKEN_CACHE_TTL)
+        else:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (
+                time.monotonic() + settings.TOKEN_CACHE_LOCAL_TTL, value)
+            self._entries.move_to_end(key)
+            self._user_keys[value[0].pk] = key
+            while len(self._entries) > settings.TOKEN_CACHE_SIZE:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        _, (user, _) = self._entries.pop(key)
+        if self._user_keys.get(user.pk) == key:
+            del self._user_keys[user.pk]
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+        shared = self._shared()
+        if shared is not None:
+            shared.delete(self.shared_prefix + key)
+
+    def invalidate_user(self, user_id, keys=()):
+        with self._lock:
+            key = self._user_keys.get(user_id)
+            if key is not None:
+                self._remove(key)
+        for key in keys:
+            self.invalidate(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, который кэширует пользователя по ключу токена,
+    чтобы не выполнять запрос к базе на каждый запрос к API.
+    Кэш сбрасывается при удалении токена, а также при сохранении
+    или удалении пользователя.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached)
+        user, token = cached
+        return copy.copy(user), token
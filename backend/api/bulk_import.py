@@ -0,0 +1,216 @@
+"""
+Массовый импорт рецептов из NDJSON в формате export_recipes.
+Авторы, теги и ингредиенты сопоставляются по заранее загруженным
+словарям, рецепты, ингредиенты рецептов и теги вставляются пачками
+через bulk_create, изображения проверяются и копируются
+в хранилище пулом потоков. Если транзакция пачки откатывается,
+скопированные изображения удаляются.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+from PIL import Image
+
+from .metrics import IMAGE_DURATION
+from reviews.constants import (LIMIT_LENGTH_RECIPE_NAME,
+                               LIMIT_LENGTH_SHORT_CODE, MAX_VALUE, MIN_VALUE)
+from reviews.models import Ingredient, IngredientRecipe, Recipe, Tag
+
+User = get_user_model()
+
+
+class RecipeImportError(ValueError):
+    pass
+
+
+def check_amount(value, name):
+    if (
+        not isinstance(value, int) or isinstance(value, bool)
+        or not MIN_VALUE <= value <= MAX_VALUE
+    ):
+        raise RecipeImportError(
+            f'{name} должно быть целым от {MIN_VALUE} до {MAX_VALUE}')
+    return value
+
+
+def check_text(value, name, max_length=None):
+    if not isinstance(value, str) or not value.strip():
+        raise RecipeImportError(f'{name} должно быть непустой строкой')
+    if max_length is not None and len(value) > max_length:
+        raise RecipeImportError(
+            f'{name} длиннее {max_length} символов')
+    return value
+
+
+def check_datetime(value):
+    try:
+        parsed = parse_datetime(value) if isinstance(value, str) else None
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise RecipeImportError(f'некорректная дата публикации {value!r}')
+    return parsed
+
+
+class RecipeImporter:
+    def __init__(self, images_dir=None, workers=4):
+        self.images_dir = images_dir
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.authors = dict(User.objects.values_list('username', 'id'))
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, unit): ingredient_id
+            for ingredient_id, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        }
+
+    def close(self):
+        self.pool.shutdown()
+
+    def parse(self, line):
+        """Разбирает строку в рецепт, id тегов и ингредиенты с количеством."""
+        try:
+            data = orjson.loads(line)
+            author = data['author']['username']
+            if author not in self.authors:
+                raise RecipeImportError(f'неизвестный автор {author}')
+            recipe = Recipe(
+                author_id=self.authors[author],
+                name=check_text(
+                    data['name'], 'name', LIMIT_LENGTH_RECIPE_NAME),
+                text=check_text(data['text'], 'text'),
+                cooking_time=check_amount(
+                    data['cooking_time'], 'cooking_time'),
+                image=check_text(data['image'], 'image'),
+            )
+            if data.get('pub_date'):
+                recipe.pub_date = check_datetime(data['pub_date'])
+            missing = set(data['tags']) - set(self.tags)
+            if missing:
+                raise RecipeImportError(
+                    f'неизвестные теги {", ".join(sorted(missing))}')
+            ingredients = {}
+            for item in data['ingredients']:
+                key = (item['name'], item['measurement_unit'])
+                if key not in self.ingredients:
+                    raise RecipeImportError(
+                        f'неизвестный ингредиент {" ".join(key)}')
+                if self.ingredients[key] in ingredients:
+                    raise RecipeImportError(
+                        f'ингредиент {" ".join(key)} повторяется')
+                ingredients[self.ingredients[key]] = check_amount(
+                    item['amount'], 'amount')
+        except orjson.JSONDecodeError as error:
+            raise RecipeImportError(f'ошибка разбора JSON: {error}')
+        except (KeyError, TypeError) as error:
+            raise RecipeImportError(f'некорректная запись: {error!r}')
+        if not ingredients:
+            raise RecipeImportError('нет ингредиентов')
+        return recipe, {self.tags[slug] for slug in data['tags']}, ingredients
+
+    def store_image(self, name):
+        """
+        Проверяет изображение из images_dir и копирует его в хранилище.
+        Без images_dir имя считается уже лежащим в хранилище.
+        """
+        if not self.images_dir:
+            return name
+        path = os.path.join(self.images_dir, name)
+        started = time.perf_counter()
+        try:
+            with Image.open(path) as image:
+                image.verify()
+            with open(path, 'rb') as file:
+                return default_storage.save(
+                    f'recipes/images/{os.path.basename(name)}', File(file))
+        except OSError as error:
+            raise RecipeImportError(f'изображение {name}: {error}')
+        finally:
+            IMAGE_DURATION.observe(
+                time.perf_counter() - started, ('import',))
+
+    def remove_images(self, names):
+        """Удаляет изображения, скопированные в хранилище пачкой."""
+        if not self.images_dir:
+            return
+        for name in names:
+            default_storage.delete(name)
+
+    def assign_short_codes(self, recipes):
+        codes = {recipe.pk: recipe.generate_short_code() for recipe in recipes}
+        taken = set(Recipe.objects.filter(
+            short_code__in=codes.values()
+        ).values_list('short_code', flat=True))
+        for recipe in recipes:
+            code = codes[recipe.pk]
+            if code in taken:
+                code = f'R{recipe.pk:06d}'[:LIMIT_LENGTH_SHORT_CODE]
+            taken.add(code)
+            recipe.short_code = code
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {Recipe._meta.db_table} SET short_code = %s '
+                'WHERE id = %s',
+                [(recipe.short_code, recipe.pk) for recipe in recipes]
+            )
+
+    def import_lines(self, lines):
+        """
+        Импортирует пачку строк одной транзакцией.
+        Возвращает число рецептов, число вставленных строк
+        и список ошибок (номер строки, сообщение).
+        """
+        parsed = []
+        errors = []
+        for number, line in lines:
+            try:
+                parsed.append((number, *self.parse(line)))
+            except RecipeImportError as error:
+                errors.append((number, str(error)))
+        images = [
+            self.pool.submit(self.store_image, recipe.image.name)
+            for _, recipe, _, _ in parsed
+        ]
+        entries = []
+        for entry, image in zip(parsed, images):
+            try:
+                entry[1].image = image.result()
+            except RecipeImportError as error:
+                errors.append((entry[0], str(error)))
+            else:
+                entries.append(entry)
+        errors.sort()
+        if not entries:
+            return 0, 0, errors
+        try:
+            with transaction.atomic():
+                recipes = Recipe.objects.bulk_create(
+                    [recipe for _, recipe, _, _ in entries],
+                    batch_size=1000)
+                self.assign_short_codes(recipes)
+                ingredients = IngredientRecipe.objects.bulk_create([
+                    IngredientRecipe(
+                        recipe=recipe, ingredient_id=ingredient_id,
+                        amount=amount)
+                    for _, recipe, _, amounts in entries
+                    for ingredient_id, amount in amounts.items()
+                ], batch_size=1000)
+                tags = Recipe.tags.through.objects.bulk_create([
+                    Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                    for _, recipe, tag_ids, _ in entries
+                    for tag_id in tag_ids
+                ], batch_size=1000)
+        except Exception:
+            self.remove_images(
+                [recipe.image.name for _, recipe, _, _ in entries])
+            raise
+        rows = len(recipes) + len(ingredients) + len(tags)
+        return len(recipes), rows, errors
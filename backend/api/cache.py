@@ -0,0 +1,100 @@
+"""Кэш общих для всех пользователей ответов со списком и рецептами."""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+
+from .metrics import CACHE_REQUESTS
+from reviews.models import CatalogueVersion
+
+FILTER_PARAMS = ('page', 'limit', 'tags', 'author', 'ordering')
+OUTPUT_PARAMS = ('fields', 'omit', 'compact')
+
+_version = {'value': None, 'expires': 0.0}
+
+
+def get_recipe_cache():
+    return caches[settings.RECIPE_CACHE_ALIAS]
+
+
+def get_catalogue_version():
+    """
+    Возвращает текущую версию каталога рецептов из базы,
+    общую для всех процессов. Прочитанное значение используется
+    процессом не дольше CATALOGUE_VERSION_TTL секунд.
+    """
+    now = time.monotonic()
+    if _version['value'] is None or now >= _version['expires']:
+        _version['value'] = CatalogueVersion.objects.filter(
+            pk=1).values_list('version', flat=True).first() or 0
+        _version['expires'] = now + settings.CATALOGUE_VERSION_TTL
+    return _version['value']
+
+
+def forget_catalogue_version():
+    """Заставляет процесс перечитать версию каталога из базы."""
+    _version['value'] = None
+
+
+def bump_catalogue_version():
+    """Делает недействительными все закэшированные страницы."""
+    if not CatalogueVersion.objects.filter(pk=1).update(
+        version=F('version') + 1
+    ):
+        CatalogueVersion.objects.get_or_create(
+            pk=1, defaults={'version': time.time_ns()})
+    forget_catalogue_version()
+
+
+def recipe_list_cache_key(request, fields):
+    """
+    Строит ключ кэша по нормализованной строке запроса
+    и выбранным полям ответа.
+    Возвращает None, если запрос не подлежит кэшированию.
+    """
+    params = request.query_params
+    if set(params) - set(FILTER_PARAMS + OUTPUT_PARAMS):
+        return None
+    normalized = urlencode([
+        (name, value)
+        for name in FILTER_PARAMS
+        for value in sorted(set(params.getlist(name)))
+    ])
+    digest = hashlib.md5(
+        f'{request.scheme}://{request.get_host()}?{normalized}'
+        f'#{",".join(fields)}'.encode()
+    ).hexdigest()
+    return f'recipes:list:{get_catalogue_version()}:{digest}'
+
+
+def recipe_detail_cache_key(request, recipe_id, fields):
+    digest = hashlib.md5(
+        f'{request.scheme}://{request.get_host()}'
+        f'#{",".join(fields)}'.encode()
+    ).hexdigest()
+    return (
+        f'recipes:detail:{get_catalogue_version()}:{recipe_id}:{digest}'
+    )
+
+
+def catalogue_cache_key(prefix, request):
+    """Ключ кэша для справочников тегов и ингредиентов."""
+    normalized = urlencode(sorted(request.query_params.lists()), doseq=True)
+    digest = hashlib.md5(
+        f'{request.scheme}://{request.get_host()}?{normalized}'.encode()
+    ).hexdigest()
+    return f'{prefix}:{get_catalogue_version()}:{digest}'
+
+
+def get_cached_page(key):
+    data = get_recipe_cache().get(key)
+    CACHE_REQUESTS.inc(
+        (key.split(':', 1)[0], 'miss' if data is None else 'hit'))
+    return data
+
+
+def set_cached_page(key, data):
+    get_recipe_cache().set(key, data, settings.RECIPE_CACHE_TIMEOUT)
@@ -0,0 +1,105 @@
+"""Сжатие ответов gzip/brotli и хранение сжатых вариантов в кэше."""
+import gzip
+
+import brotli
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .cache import get_cached_page, set_cached_page
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+ENCODINGS = ('br', 'gzip')
+
+
+def compress(content, encoding):
+    """
+    Сжимает с умеренной степенью: максимальная (brotli 11, gzip 9)
+    на порядки медленнее и выполнялась бы внутри запроса.
+    """
+    if encoding == 'br':
+        return brotli.compress(content, quality=5)
+    return gzip.compress(content, compresslevel=6, mtime=0)
+
+
+def accepted_encodings(request):
+    accepted = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        quality = params.strip().removeprefix('q=')
+        try:
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        if name:
+            accepted.add(name)
+    return accepted
+
+
+def negotiate_encoding(request, available=ENCODINGS):
+    """Выбирает лучшую поддерживаемую клиентом кодировку."""
+    accepted = accepted_encodings(request)
+    for encoding in available:
+        if encoding in accepted or '*' in accepted:
+            return encoding
+    return 'identity'
+
+
+def is_compressible(response):
+    return (
+        not response.streaming
+        and not response.has_header('Content-Encoding')
+        and response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES)
+        and len(response.content) >= settings.COMPRESSION_MIN_SIZE
+    )
+
+
+def encode_variants(content, precompress=True):
+    """
+    Возвращает тело ответа во всех кодировках.
+    Небольшие тела и тела с precompress=False не сжимаются:
+    их при необходимости сожмет CompressionMiddleware.
+    """
+    variants = {'identity': content}
+    if precompress and len(content) >= settings.COMPRESSION_MIN_SIZE:
+        for encoding in ENCODINGS:
+            variants[encoding] = compress(content, encoding)
+    return variants
+
+
+def precompressed_response(request, key, build_data):
+    """
+    Отдает JSON-ответ из кэша, где он хранится уже сжатым
+    в каждой кодировке; при промахе строит данные через build_data,
+    рендерит и сжимает их один раз. Ответы с фильтрами меньше
+    PRECOMPRESS_FILTERED_MIN_SIZE, например подсказки ингредиентов
+    по началу названия, хранятся несжатыми: таких вариантов много,
+    а каждый запрашивается редко.
+    """
+    variants = get_cached_page(key)
+    cache_status = 'HIT'
+    if variants is None:
+        content = request.accepted_renderer.render(
+            build_data(), request.accepted_media_type, {'request': request}
+        )
+        variants = encode_variants(
+            content,
+            precompress=not request.query_params
+            or len(content) >= settings.PRECOMPRESS_FILTERED_MIN_SIZE
+        )
+        set_cached_page(key, variants)
+        cache_status = 'MISS'
+    encoding = negotiate_encoding(
+        request, [name for name in ENCODINGS if name in variants]
+    )
+    response = HttpResponse(
+        variants[encoding],
+        content_type=request.accepted_renderer.media_type
+    )
+    if encoding != 'identity':
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    response['X-Cache'] = cache_status
+    return response
@@ -1,3 +1,10 @@
 """Константы приложения"""
 
 PAGE_SIZE = 6
+BULK_MAX_IDS = 100
+BATCH_MAX_REQUESTS = 20
+EXPENSIVE_REQUEST_COST = 5
+DOWNLOAD_SHOPPING_CART_COST = 10
+SUBSCRIPTIONS_UNLIMITED_RECIPES_COST = 3
+PANTRY_MAX_RESULTS = 100
+PANTRY_OVERFETCH = 2
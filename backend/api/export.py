@@ -0,0 +1,91 @@
+"""
+Потоковая выгрузка каталога рецептов в NDJSON.
+Рецепты читаются по возрастанию id серверным курсором,
+теги и ингредиенты подгружаются одним запросом на блок,
+поэтому память не зависит от размера каталога.
+"""
+import os
+
+import orjson
+from django.conf import settings
+
+from .projections import project_ingredients, project_tags
+from reviews.models import Recipe
+
+EXPORT_FIELDS = (
+    'id',
+    'author_id',
+    'author__username',
+    'name',
+    'text',
+    'cooking_time',
+    'image',
+    'pub_date',
+)
+
+
+def export_chunk(rows):
+    recipe_ids = [row['id'] for row in rows]
+    tags = project_tags(recipe_ids)
+    ingredients = project_ingredients(recipe_ids)
+    for row in rows:
+        yield orjson.dumps({
+            'id': row['id'],
+            'author': {
+                'id': row['author_id'],
+                'username': row['author__username'],
+            },
+            'name': row['name'],
+            'text': row['text'],
+            'cooking_time': row['cooking_time'],
+            'image': row['image'],
+            'pub_date': row['pub_date'],
+            'tags': [tag['slug'] for tag in tags[row['id']]],
+            'ingredients': [
+                {
+                    'name': ingredient['name'],
+                    'measurement_unit': ingredient['measurement_unit'],
+                    'amount': ingredient['amount'],
+                }
+                for ingredient in ingredients[row['id']]
+            ],
+        }, option=orjson.OPT_APPEND_NEWLINE)
+
+
+def export_recipes(after_id=0, chunk_size=None):
+    """
+    Выдает строки NDJSON для рецептов с id больше after_id.
+    Выгрузку можно продолжить, передав id последней строки.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    rows = []
+    for row in Recipe.objects.filter(
+        id__gt=after_id, is_hidden=False
+    ).order_by('id').values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size):
+        rows.append(row)
+        if len(rows) == chunk_size:
+            yield from export_chunk(rows)
+            rows = []
+    if rows:
+        yield from export_chunk(rows)
+
+
+def last_exported_id(path, block_size=65536):
+    """
+    Возвращает id последней полной строки файла выгрузки
+    и отрезает недописанную строку после нее.
+    """
+    with open(path, 'rb+') as file:
+        end = file.seek(0, os.SEEK_END)
+        tail = b''
+        position = end
+        while position > 0 and tail.count(b'\n') < 2:
+            position = max(0, position - block_size)
+            file.seek(position)
+            tail = file.read(end - position)
+        complete = tail[:tail.rfind(b'\n') + 1]
+        file.truncate(position + len(complete))
+        lines = complete.splitlines()
+        if not lines:
+            return 0
+        return orjson.loads(lines[-1])['id']
@@ -0,0 +1,170 @@
+"""
+Лента рецептов авторов, на которых подписан пользователь.
+Рецепты обычных авторов раскладываются по лентам подписчиков
+при публикации (fan-out on write); рецепты авторов с очень большим
+числом подписчиков подмешиваются при чтении (fan-out on read).
+"""
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from rest_framework.exceptions import ValidationError
+
+from .cache import get_recipe_cache
+from reviews.models import Recipe, TimelineEntry
+from users.models import Subscription
+
+HIGH_FANOUT_AUTHORS_KEY = 'feed:high_fanout_authors'
+
+
+def get_high_fanout_authors():
+    """Возвращает id авторов, рецепты которых не раскладываются по лентам."""
+    cache = get_recipe_cache()
+    authors = cache.get(HIGH_FANOUT_AUTHORS_KEY)
+    if authors is None:
+        authors = set(Subscription.objects.values('author').annotate(
+            followers=Count('id')
+        ).filter(
+            followers__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+        ).values_list('author', flat=True))
+        cache.set(
+            HIGH_FANOUT_AUTHORS_KEY,
+            authors,
+            settings.FEED_HIGH_FANOUT_TIMEOUT
+        )
+    return authors
+
+
+def trim_timelines(user_ids):
+    """
+    Обрезает ленты пользователей до FEED_MAX_LENGTH записей
+    одним DELETE: номер записи в ленте считается оконной функцией.
+    """
+    stale = TimelineEntry.objects.filter(
+        user_id__in=user_ids
+    ).annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=F('user_id'),
+            order_by=(F('pub_date').desc(), F('recipe_id').desc())
+        )
+    ).filter(
+        position__gt=settings.FEED_MAX_LENGTH
+    ).values('id')
+    TimelineEntry.objects.filter(id__in=stale).delete()
+
+
+def fan_out_recipe(recipe):
+    """Добавляет новый рецепт в ленты подписчиков автора."""
+    max_followers = settings.FEED_FANOUT_MAX_FOLLOWERS
+    follower_ids = list(Subscription.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True)[:max_followers + 1])
+    if len(follower_ids) > max_followers:
+        cache = get_recipe_cache()
+        cache.set(
+            HIGH_FANOUT_AUTHORS_KEY,
+            get_high_fanout_authors() | {recipe.author_id},
+            settings.FEED_HIGH_FANOUT_TIMEOUT
+        )
+        return
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=user_id, recipe=recipe, pub_date=recipe.pub_date)
+            for user_id in follower_ids
+        ],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+    trim_timelines(follower_ids)
+
+
+def backfill_timeline(user_id, author_id):
+    """Добавляет в ленту последние рецепты автора после подписки."""
+    if author_id in get_high_fanout_authors():
+        return
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+            for recipe_id, pub_date in Recipe.objects.filter(
+                author_id=author_id, is_hidden=False
+            ).order_by('-pub_date', '-id').values_list(
+                'id', 'pub_date'
+            )[:settings.FEED_MAX_LENGTH]
+        ],
+        ignore_conflicts=True
+    )
+    trim_timelines([user_id])
+
+
+@transaction.atomic
+def rebuild_timeline(user_id):
+    """Пересобирает ленту пользователя по его подпискам."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    TimelineEntry.objects.bulk_create([
+        TimelineEntry(
+            user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+        for recipe_id, pub_date in Recipe.objects.filter(
+            author__subscribers__user_id=user_id, is_hidden=False
+        ).exclude(
+            author_id__in=get_high_fanout_authors()
+        ).order_by('-pub_date', '-id').values_list(
+            'id', 'pub_date'
+        )[:settings.FEED_MAX_LENGTH]
+    ])
+
+
+def encode_cursor(pub_date, recipe_id):
+    return base64.urlsafe_b64encode(
+        f'{pub_date.isoformat()}|{recipe_id}'.encode()
+    ).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        pub_date, recipe_id = base64.urlsafe_b64decode(
+            cursor.encode()
+        ).decode().split('|')
+        return datetime.fromisoformat(pub_date), int(recipe_id)
+    except ValueError:
+        raise ValidationError({'cursor': 'Некорректный курсор.'})
+
+
+def read_feed(user, limit, cursor=None):
+    """
+    Возвращает id рецептов страницы ленты (от новых к старым)
+    и курсор следующей страницы. Пагинация по ключу (pub_date, id).
+    """
+    timeline = TimelineEntry.objects.filter(user=user)
+    high_fanout = get_high_fanout_authors()
+    if high_fanout:
+        high_fanout &= set(
+            user.subscriptions.values_list('author_id', flat=True))
+    recipes = Recipe.objects.filter(
+        author_id__in=high_fanout, is_hidden=False)
+    if cursor:
+        pub_date, recipe_id = decode_cursor(cursor)
+        timeline = timeline.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, recipe_id__lt=recipe_id)
+        )
+        recipes = recipes.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=recipe_id)
+        )
+    rows = set(timeline.order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id'
+    )[:limit + 1])
+    if high_fanout:
+        rows.update(recipes.order_by('-pub_date', '-id').values_list(
+            'pub_date', 'id'
+        )[:limit + 1])
+    rows = sorted(rows, reverse=True)
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(*rows[limit - 1])
+    return [recipe_id for _, recipe_id in rows[:limit]], next_cursor
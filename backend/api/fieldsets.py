@@ -0,0 +1,31 @@
+"""Выбор полей ответа параметрами запроса fields= и omit=."""
+from rest_framework.permissions import SAFE_METHODS
+
+ALWAYS_INCLUDED = ('id',)
+
+
+def split_param(request, name):
+    return {
+        field.strip()
+        for value in request.GET.getlist(name)
+        for field in value.split(',')
+        if field.strip()
+    }
+
+
+def requested_fields(request, available):
+    """
+    Возвращает поля из available (в исходном порядке),
+    оставленные параметрами fields= и omit=.
+    Поле id возвращается всегда, неизвестные имена игнорируются,
+    для изменяющих запросов выбор не применяется.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return tuple(available)
+    fields = split_param(request, 'fields')
+    omit = split_param(request, 'omit')
+    return tuple(
+        name for name in available
+        if name in ALWAYS_INCLUDED
+        or ((not fields or name in fields) and name not in omit)
+    )
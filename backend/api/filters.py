@@ -1,5 +1,6 @@
 import django_filters
 
+from .ranking import RANKING_ORDERINGS
 from reviews.models import Ingredient, Recipe
 
 
@@ -13,6 +14,10 @@ class RecipeFilter(django_filters.FilterSet):
     is_in_shopping_cart = django_filters.NumberFilter(
         method='filter_is_in_shopping_cart'
     )
+    ordering = django_filters.ChoiceFilter(
+        choices=[(name, name) for name in RANKING_ORDERINGS],
+        method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
@@ -40,6 +45,9 @@ class RecipeFilter(django_filters.FilterSet):
             return queryset.filter(shopping_carts__author=author)
         return queryset.exclude(shopping_carts__author=author)
 
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*RANKING_ORDERINGS[value])
+
 
 class IngredientFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(
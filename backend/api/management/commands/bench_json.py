@@ -0,0 +1,80 @@
+import io
+import timeit
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer
+from api.serializers import RecipeReadSerializer
+from reviews.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение JSONRenderer/JSONParser и ORJSONRenderer/ORJSONParser '
+        'на страницах рецептов из базы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=6,
+                            help='Рецептов на странице')
+        parser.add_argument('--pages', type=int, default=10,
+                            help='Количество страниц')
+        parser.add_argument('--repeat', type=int, default=200,
+                            help='Повторов на каждую страницу')
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        queryset = Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            'ingredients_relations__ingredient'
+        )
+        pages = []
+        for offset in range(0, options['pages'] * limit, limit):
+            results = RecipeReadSerializer(
+                queryset[offset:offset + limit],
+                many=True,
+                context={'shared': True}
+            ).data
+            if not results:
+                break
+            pages.append({'count': len(results), 'results': results})
+        if not pages:
+            self.stderr.write('Нет рецептов для замера')
+            return
+
+        renderers = (JSONRenderer(), ORJSONRenderer())
+        parsers = (JSONParser(), ORJSONParser())
+        rendered = [renderers[0].render(page) for page in pages]
+        for page, expected in zip(pages, rendered):
+            if renderers[1].render(page) != expected:
+                self.stderr.write('Вывод ORJSONRenderer отличается!')
+                return
+
+        self.stdout.write(
+            f'Страниц: {len(pages)}, средний размер: '
+            f'{sum(map(len, rendered)) // len(rendered)} байт'
+        )
+        repeat = options['repeat']
+        for action, (standard, fast) in (
+            ('render', (
+                lambda: [renderers[0].render(page) for page in pages],
+                lambda: [renderers[1].render(page) for page in pages],
+            )),
+            ('parse', (
+                lambda: [parsers[0].parse(io.BytesIO(body))
+                         for body in rendered],
+                lambda: [parsers[1].parse(io.BytesIO(body))
+                         for body in rendered],
+            )),
+        ):
+            standard_time = timeit.timeit(standard, number=repeat)
+            fast_time = timeit.timeit(fast, number=repeat)
+            per_page = 1e6 / (repeat * len(pages))
+            self.stdout.write(
+                f'{action}: json {standard_time * per_page:.1f} мкс/стр., '
+                f'orjson {fast_time * per_page:.1f} мкс/стр., '
+                f'ускорение x{standard_time / fast_time:.1f}'
+            )
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.metrics import Counter, Histogram
+
+
+class Command(BaseCommand):
+    help = 'Замер стоимости записи отсчета в счетчик и гистограмму'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=1000000,
+                            help='Количество отсчетов')
+
+    def handle(self, *args, **options):
+        samples = options['samples']
+        counter = Counter('bench_total', 'bench', ('view', 'action'))
+        histogram = Histogram('bench_seconds', 'bench', ('view', 'action'))
+        labels = ('RecipeViewSet', 'list')
+        for name, record in (
+            ('Counter.inc', lambda: counter.inc(labels)),
+            ('Histogram.observe', lambda: histogram.observe(0.03, labels)),
+        ):
+            started = time.perf_counter()
+            for _ in range(samples):
+                record()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{name}: {elapsed / samples * 1e9:.0f} нс на отсчет')
@@ -0,0 +1,82 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from api.pantry import IngredientIndex
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер обратного индекса ингредиентов на синтетическом каталоге: '
+        'построение, память и поиск в сравнении с полным перебором рецептов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000,
+                            help='Рецептов в каталоге')
+        parser.add_argument('--ingredients', type=int, default=2000,
+                            help='Ингредиентов в справочнике')
+        parser.add_argument('--per-recipe', type=int, default=8,
+                            help='Ингредиентов в рецепте')
+        parser.add_argument('--queries', type=int, default=200,
+                            help='Количество поисковых запросов')
+        parser.add_argument('--missing', type=int, default=1,
+                            help='Допустимо недостающих ингредиентов')
+
+    def handle(self, *args, **options):
+        generator = np.random.default_rng(1)
+        weights = 1 / np.arange(1, options['ingredients'] + 1)
+        weights /= weights.sum()
+        recipes = [
+            generator.choice(
+                options['ingredients'], options['per_recipe'],
+                replace=False, p=weights
+            )
+            for _ in range(options['recipes'])
+        ]
+        pairs = np.array([
+            (recipe_id, ingredient_id)
+            for recipe_id, ingredient_ids in enumerate(recipes, 1)
+            for ingredient_id in ingredient_ids
+        ])
+        index = IngredientIndex()
+        started = time.perf_counter()
+        index.load_pairs(pairs)
+        built = time.perf_counter() - started
+        size = index.recipe_ids.nbytes + index.counts.nbytes + sum(
+            rows.nbytes for rows in index.postings.values())
+        self.stdout.write(
+            f'Построение: {built:.2f} с, массивы индекса: '
+            f'{size / 2 ** 20:.1f} МБ')
+
+        queries = [
+            generator.choice(
+                options['ingredients'], generator.integers(5, 16),
+                replace=False, p=weights
+            ).tolist()
+            for _ in range(options['queries'])
+        ]
+        recipe_sets = [set(ingredient_ids.tolist())
+                       for ingredient_ids in recipes]
+        timings = {'индекс': [], 'перебор': []}
+        for query in queries:
+            started = time.perf_counter()
+            found = index.search(query, options['missing'])
+            timings['индекс'].append(time.perf_counter() - started)
+            started = time.perf_counter()
+            query = set(query)
+            scanned = [
+                recipe_id
+                for recipe_id, ingredient_ids in enumerate(recipe_sets, 1)
+                if ingredient_ids & query
+                and len(ingredient_ids - query) <= options['missing']
+            ]
+            timings['перебор'].append(time.perf_counter() - started)
+            assert sorted(scanned) == sorted(
+                recipe_id for recipe_id, *_ in found)
+        for name, values in timings.items():
+            values = np.array(values) * 1000
+            self.stdout.write(
+                f'{name}: p50 {np.percentile(values, 50):.2f} мс, '
+                f'p99 {np.percentile(values, 99):.2f} мс')
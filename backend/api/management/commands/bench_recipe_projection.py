@@ -0,0 +1,69 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from api.projections import project_recipes
+from api.serializers import RecipeReadSerializer
+from reviews.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение RecipeReadSerializer и values()-проекции '
+        'по времени и памяти на страницу рецептов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=6,
+                            help='Рецептов на странице')
+        parser.add_argument('--pages', type=int, default=10,
+                            help='Количество страниц')
+
+    def serialize(self, recipe_ids):
+        queryset = Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).select_related('author').prefetch_related(
+            'tags',
+            'ingredients_relations__ingredient'
+        )
+        return RecipeReadSerializer(
+            queryset,
+            many=True,
+            context={'shared': True}
+        ).data
+
+    def measure(self, build, pages):
+        elapsed = 0.0
+        peak = 0
+        for recipe_ids in pages:
+            tracemalloc.start()
+            started = time.perf_counter()
+            build(recipe_ids)
+            elapsed += time.perf_counter() - started
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        return elapsed / len(pages), peak
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        recipe_ids = list(Recipe.objects.values_list(
+            'id', flat=True
+        )[:limit * options['pages']])
+        pages = [
+            recipe_ids[offset:offset + limit]
+            for offset in range(0, len(recipe_ids), limit)
+        ]
+        if not pages:
+            self.stderr.write('Нет рецептов для замера')
+            return
+        self.measure(project_recipes, pages[:1])
+        for name, build in (
+            ('serializer', self.serialize),
+            ('projection', project_recipes),
+        ):
+            elapsed, peak = self.measure(build, pages)
+            self.stdout.write(
+                f'{name}: {elapsed * 1000:.2f} мс/стр., '
+                f'пик памяти {peak / 1024:.0f} КБ'
+            )
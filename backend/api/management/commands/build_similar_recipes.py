@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from api.similarity import build_similar_recipes
+
+
+class Command(BaseCommand):
+    help = 'Пересчет похожих рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Пересчитать все рецепты')
+        parser.add_argument('--top-k', type=int,
+                            help='Количество соседей у рецепта')
+        parser.add_argument('--chunk-size', type=int,
+                            help='Рецептов в одном блоке вычислений')
+
+    def handle(self, *args, **options):
+        run = build_similar_recipes(
+            full=options['full'],
+            top_k=options['top_k'],
+            chunk_size=options['chunk_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {run.recipes_updated} '
+            f'из {run.recipes_total} за {run.duration:.2f} с'))
@@ -0,0 +1,35 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.export import export_recipes, last_exported_id
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка всех рецептов в NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', type=str, help='Путь к файлу NDJSON')
+        parser.add_argument('--resume', action='store_true',
+                            help='Продолжить выгрузку в существующий файл')
+        parser.add_argument('--chunk-size', type=int,
+                            help='Рецептов в одном блоке чтения')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        after_id = 0
+        mode = 'wb'
+        if options['resume'] and os.path.exists(output):
+            after_id = last_exported_id(output)
+            mode = 'ab'
+        started = time.perf_counter()
+        exported = 0
+        with open(output, mode) as file:
+            for line in export_recipes(after_id, options['chunk_size']):
+                file.write(line)
+                exported += 1
+        duration = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено рецептов: {exported} (после id {after_id}) '
+            f'за {duration:.2f} с'))
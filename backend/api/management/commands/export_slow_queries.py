@@ -0,0 +1,26 @@
+import orjson
+from django.core.management.base import BaseCommand
+
+from api.slow_queries import export_slow_queries
+from reviews.models import SlowQuery
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка журнала медленных SQL-запросов в JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?',
+                            help='Путь к файлу JSON, по умолчанию stdout')
+        parser.add_argument('--view', help='Только для представления')
+
+    def handle(self, *args, **options):
+        queryset = SlowQuery.objects.all()
+        if options['view']:
+            queryset = queryset.filter(view=options['view'])
+        data = orjson.dumps(
+            export_slow_queries(queryset), option=orjson.OPT_INDENT_2)
+        if options['output']:
+            with open(options['output'], 'wb') as file:
+                file.write(data)
+        else:
+            self.stdout.write(data.decode())
@@ -0,0 +1,63 @@
+import itertools
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.bulk_import import RecipeImporter
+from api.cache import bump_catalogue_version
+
+
+class Command(BaseCommand):
+    help = 'Массовый импорт рецептов из NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', type=str, help='Путь к файлу NDJSON')
+        parser.add_argument('--images-dir', type=str,
+                            help='Каталог с изображениями рецептов')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Рецептов в одной транзакции')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Потоков обработки изображений')
+        parser.add_argument('--resume', action='store_true',
+                            help='Продолжить с последней сохраненной пачки')
+
+    def handle(self, *args, **options):
+        progress_path = options['input'] + '.progress'
+        skip = 0
+        if options['resume'] and os.path.exists(progress_path):
+            with open(progress_path) as progress:
+                skip = int(progress.read() or 0)
+        importer = RecipeImporter(options['images_dir'], options['workers'])
+        started = time.perf_counter()
+        imported = rows = failed = 0
+        try:
+            with open(options['input'], 'rb') as file:
+                lines = (
+                    (number, line)
+                    for number, line in enumerate(file, 1)
+                    if line.strip()
+                )
+                lines = itertools.dropwhile(
+                    lambda entry: entry[0] <= skip, lines)
+                while batch := list(
+                    itertools.islice(lines, options['batch_size'])
+                ):
+                    batch_recipes, batch_rows, errors = (
+                        importer.import_lines(batch))
+                    imported += batch_recipes
+                    rows += batch_rows
+                    failed += len(errors)
+                    for number, message in errors:
+                        self.stderr.write(f'Строка {number}: {message}')
+                    with open(progress_path, 'w') as progress:
+                        progress.write(str(batch[-1][0]))
+        finally:
+            importer.close()
+            bump_catalogue_version()
+        duration = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано рецептов: {imported}, ошибок: {failed}, '
+            f'строк в базе: {rows} за {duration:.2f} с '
+            f'({imported / duration:.0f} рецептов/с, '
+            f'{rows / duration:.0f} строк/с)'))
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.profiling import make_profile_token
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выдает сотруднику подписанное значение заголовка '
+        'X-Profile-Token для профилирования запросов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email сотрудника')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(
+            email=options['email'], is_staff=True, is_active=True).first()
+        if user is None:
+            raise CommandError('Активный сотрудник с таким email не найден')
+        self.stdout.write(make_profile_token(user))
+        self.stderr.write(
+            f'Токен действует {settings.PROFILING_TOKEN_MAX_AGE} с')
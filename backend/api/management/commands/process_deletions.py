@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reviews.deletion import pending_jobs, process_job
+from reviews.models import DeletionJob
+
+
+class Command(BaseCommand):
+    help = 'Фоновое удаление скрытых рецептов и пользователей пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Строк в одной пачке удаления')
+        parser.add_argument('--loop', action='store_true',
+                            help='Работать постоянно, ожидая новые задачи')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Пауза между проверками в режиме --loop, с')
+
+    def handle(self, *args, **options):
+        while True:
+            for job_id in pending_jobs():
+                error = process_job(job_id, options['batch_size'])
+                job = DeletionJob.objects.get(pk=job_id)
+                if error:
+                    self.stderr.write(f'{job}: {error}')
+                else:
+                    self.stdout.write(
+                        f'{job}: {job.get_status_display()}, '
+                        f'удалено строк: {job.rows_deleted}')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from api.feed import rebuild_timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересборка лент подписок пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append',
+                            help='id пользователя (можно несколько раз)')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(
+            Q(subscriptions__isnull=False)
+            | Q(timeline_entries__isnull=False)
+        ).distinct()
+        if options['user']:
+            users = User.objects.filter(pk__in=options['user'])
+        rebuilt = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            rebuild_timeline(user_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано лент: {rebuilt}'))
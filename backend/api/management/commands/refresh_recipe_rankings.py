@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.ranking import refresh_rankings
+
+
+class Command(BaseCommand):
+    help = 'Пересчет популярности и трендовости рецептов'
+
+    def handle(self, *args, **options):
+        run = refresh_rankings()
+        self.stdout.write(self.style.SUCCESS(
+            f'Рецептов с рейтингом: {run.recipes_scored} '
+            f'за {run.duration:.2f} с'))
@@ -0,0 +1,393 @@
+"""
+Метрики бэкенда в формате экспозиции Prometheus.
+Каждый поток копит значения в собственном словаре без блокировок,
+поэтому запись отсчета дешевле микросекунды. Если задан METRICS_DIR,
+процесс раз в METRICS_FLUSH_INTERVAL секунд сбрасывает значения
+в собственный файл этого каталога, а /metrics суммирует файлы
+всех процессов gunicorn. Файлы завершившихся процессов сводятся
+в один файл, чтобы счетчики не убывали, а каталог не рос. Процессы
+проверяются по pid, поэтому каталог не должен быть общим для разных
+контейнеров.
+"""
+import atexit
+import fcntl
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+
+import orjson
+from django.conf import settings
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+WORKER_FILE = re.compile(r'^(\d+)-\d+\.json(?:\.tmp)?$')
+DEAD_WORKERS_FILE = 'dead.json'
+LOCK_FILE = 'metrics.lock'
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def escape(value):
+    return str(value).replace('\\', r'\\').replace(
+        '\n', r'\n').replace('"', r'\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric:
+    """
+    Значения хранятся по потокам: словарь потока создается
+    при первой записи и регистрируется в _shards по идентификатору
+    потока. При сборе значения завершившихся потоков переносятся
+    в общий словарь _base, поэтому число словарей не превышает
+    числа живых потоков.
+    """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._local = threading.local()
+        self._shards = {}
+        self._base = {}
+
+    def _shard(self):
+        # current_thread() регистрирует и потоки, созданные не через
+        # threading, чтобы их словари не считались брошенными.
+        ident = threading.current_thread().ident
+        with self._lock:
+            values = self._shards.setdefault(ident, {})
+        self._local.values = values
+        return values
+
+    def merge(self, total, value):
+        raise NotImplementedError
+
+    def _fold(self, values):
+        for labels, value in values.items():
+            self._base[labels] = self.merge(self._base.get(labels), value)
+
+    def collect(self):
+        """Сводит значения всех потоков."""
+        alive = {thread.ident for thread in threading.enumerate()}
+        with self._lock:
+            for ident in list(self._shards):
+                if ident not in alive:
+                    self._fold(self._shards.pop(ident))
+            shards = [self._base.copy()] + [
+                values.copy() for values in self._shards.values()
+            ]
+        totals = {}
+        for values in shards:
+            for labels, value in values.items():
+                totals[labels] = self.merge(totals.get(labels), value)
+        return totals
+
+    def samples(self, labels, value):
+        raise NotImplementedError
+
+    def expose(self, values):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.type}',
+        ]
+        for labels in sorted(values):
+            for suffix, extra, sample in self.samples(labels, values[labels]):
+                lines.append(
+                    f'{self.name}{suffix}'
+                    f'{format_labels(self.labelnames, labels, extra)} '
+                    f'{format_value(sample)}')
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        try:
+            values = self._local.values
+        except AttributeError:
+            values = self._shard()
+        values[labels] = values.get(labels, 0) + amount
+
+    def merge(self, total, value):
+        return (total or 0) + value
+
+    def samples(self, labels, value):
+        return (('', (), value),)
+
+
+class Histogram(Metric):
+    """
+    Значение по набору меток — число отсчетов в каждой корзине
+    (последняя — +Inf) и сумма отсчетов в конце списка.
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, labels=()):
+        try:
+            values = self._local.values
+        except AttributeError:
+            values = self._shard()
+        counts = values.get(labels)
+        if counts is None:
+            counts = values[labels] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def merge(self, total, value):
+        if total is None:
+            return list(value)
+        return [left + right for left, right in zip(total, value)]
+
+    def samples(self, labels, value):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float('inf')), value):
+            cumulative += count
+            yield '_bucket', (('le', format_value(bound)),), cumulative
+        yield '_sum', (), value[-1]
+        yield '_count', (), cumulative
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.file_name = None
+        self.next_flush = 0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def reset(self):
+        """Обнуляет значения, например в дочернем процессе после fork."""
+        for metric in self.metrics.values():
+            metric.reset()
+        self.file_name = None
+        self.next_flush = 0
+
+    def snapshot(self):
+        return self.dump({
+            name: metric.collect() for name, metric in self.metrics.items()
+        })
+
+    def dump(self, totals):
+        return {
+            name: [[list(labels), value] for labels, value in values.items()]
+            for name, values in totals.items()
+        }
+
+    def merge_snapshot(self, totals, data):
+        for name, rows in data.items():
+            metric = self.metrics.get(name)
+            if metric is None:
+                continue
+            for labels, value in rows:
+                labels = tuple(labels)
+                totals[name][labels] = metric.merge(
+                    totals[name].get(labels), value)
+
+    def path(self, file_name):
+        return os.path.join(settings.METRICS_DIR, file_name)
+
+    def read(self, file_name):
+        try:
+            with open(self.path(file_name), 'rb') as file:
+                return orjson.loads(file.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return None
+
+    def write(self, file_name, data):
+        """Атомарно записывает файл каталога METRICS_DIR."""
+        path = self.path(file_name)
+        with open(f'{path}.tmp', 'wb') as file:
+            file.write(orjson.dumps(data))
+        os.replace(f'{path}.tmp', path)
+
+    def flush(self):
+        """Записывает значения процесса в его файл."""
+        if not settings.METRICS_DIR:
+            return
+        if self.file_name is None:
+            if not any(
+                metric._shards or metric._base
+                for metric in self.metrics.values()
+            ):
+                return
+            self.file_name = f'{os.getpid()}-{time.time_ns()}.json'
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        self.write(self.file_name, self.snapshot())
+        self.next_flush = time.monotonic() + settings.METRICS_FLUSH_INTERVAL
+
+    def maybe_flush(self):
+        if time.monotonic() >= self.next_flush:
+            self.flush()
+
+    def compact(self, lock):
+        """
+        Переносит значения завершившихся процессов в DEAD_WORKERS_FILE
+        и удаляет их файлы. В DEAD_WORKERS_FILE записываются и имена
+        перенесенных файлов: если процесс упадет до их удаления,
+        следующий перенос не учтет их дважды. Если блокировку держит
+        другой процесс, перенос пропускается.
+        """
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+        try:
+            dead = []
+            for file_name in os.listdir(settings.METRICS_DIR):
+                match = WORKER_FILE.match(file_name)
+                if match and not process_alive(int(match[1])):
+                    dead.append(file_name)
+            if not dead:
+                return
+            accumulated = self.read(DEAD_WORKERS_FILE) or {}
+            merged = set(accumulated.get('files', ()))
+            totals = {name: {} for name in self.metrics}
+            self.merge_snapshot(totals, accumulated.get('metrics', {}))
+            for file_name in dead:
+                data = None
+                if file_name not in merged and not file_name.endswith('.tmp'):
+                    data = self.read(file_name)
+                if data is not None:
+                    self.merge_snapshot(totals, data)
+            self.write(DEAD_WORKERS_FILE, {
+                'files': dead, 'metrics': self.dump(totals),
+            })
+            for file_name in dead:
+                try:
+                    os.remove(self.path(file_name))
+                except FileNotFoundError:
+                    pass
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def worker_snapshots(self):
+        """
+        Значения из файлов всех процессов. Файлы читаются под общей
+        блокировкой, чтобы перенос не удалил файл между чтением
+        DEAD_WORKERS_FILE и чтением самого файла.
+        """
+        self.flush()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        with open(self.path(LOCK_FILE), 'a') as lock:
+            self.compact(lock)
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            accumulated = self.read(DEAD_WORKERS_FILE) or {}
+            merged = set(accumulated.get('files', ()))
+            snapshots = [accumulated.get('metrics', {})]
+            for file_name in os.listdir(settings.METRICS_DIR):
+                if (
+                    file_name.endswith('.json')
+                    and WORKER_FILE.match(file_name)
+                    and file_name not in merged
+                ):
+                    snapshots.append(self.read(file_name) or {})
+        return snapshots
+
+    def collect(self):
+        """
+        Суммирует значения из файлов всех процессов,
+        а без METRICS_DIR возвращает значения текущего процесса.
+        """
+        totals = {name: {} for name in self.metrics}
+        snapshots = (
+            self.worker_snapshots() if settings.METRICS_DIR
+            else [self.snapshot()]
+        )
+        for data in snapshots:
+            self.merge_snapshot(totals, data)
+        return totals
+
+    def expose(self):
+        totals = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.extend(metric.expose(totals[name]))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+os.register_at_fork(after_in_child=registry.reset)
+atexit.register(registry.flush)
+
+REQUESTS = registry.counter(
+    'foodgram_http_requests_total',
+    'HTTP-запросы по представлению, действию и коду ответа',
+    ('view', 'action', 'status'),
+)
+REQUEST_DURATION = registry.histogram(
+    'foodgram_http_request_duration_seconds',
+    'Время обработки запроса',
+    ('view', 'action'),
+)
+REQUEST_QUERIES = registry.histogram(
+    'foodgram_http_request_db_queries',
+    'SQL-запросов на один HTTP-запрос',
+    ('view', 'action'),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+CACHE_REQUESTS = registry.counter(
+    'foodgram_cache_requests_total',
+    'Обращения к кэшу ответов по результату hit или miss',
+    ('cache', 'result'),
+)
+IMAGE_DURATION = registry.histogram(
+    'foodgram_image_processing_seconds',
+    'Время обработки изображений',
+    ('operation',),
+)
+
+
+def view_labels(request):
+    """Метки представления и действия DRF для запроса."""
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched', ''
+    view = getattr(match.func, 'cls', None)
+    actions = getattr(match.func, 'actions', None) or {}
+    return (
+        view.__name__ if view else match.view_name,
+        actions.get(request.method.lower(), ''),
+    )
@@ -0,0 +1,97 @@
+import re
+import time
+
+from django.db import connection
+from django.utils.cache import patch_vary_headers
+
+from .compression import compress, is_compressible, negotiate_encoding
+from .metrics import (REQUEST_DURATION, REQUEST_QUERIES, REQUESTS,
+                      registry, view_labels)
+from .profiling import QueryCounter, profile_request, profiling_user
+from .slow_queries import current_view, save_slow_queries
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы больше COMPRESSION_MIN_SIZE в brotli или gzip
+    в зависимости от Accept-Encoding. Уже сжатые ответы
+    (например, взятые из кэша) пропускаются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not is_compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request)
+        if encoding == 'identity':
+            return response
+        response.content = compress(response.content, encoding)
+        response['Content-Length'] = str(len(response.content))
+        response['Content-Encoding'] = encoding
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub(r'^"', 'W/"', response['ETag'])
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Снимает профиль запроса, если его запросил сотрудник
+    подписанным заголовком или параметром _profile.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user = profiling_user(request)
+        if user is None:
+            return self.get_response(request)
+        return profile_request(request, self.get_response, user)
+
+
+class MetricsMiddleware:
+    """
+    Записывает длительность, код ответа и число SQL-запросов
+    по представлению и действию DRF.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        view, action = view_labels(request)
+        REQUESTS.inc((view, action, str(response.status_code)))
+        REQUEST_DURATION.observe(duration, (view, action))
+        REQUEST_QUERIES.observe(counter.count, (view, action))
+        registry.maybe_flush()
+        return response
+
+
+class SlowQueryMiddleware:
+    """
+    Сообщает журналу медленных запросов текущее представление
+    и сохраняет накопленные записи после ответа.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_view.set(('', ''))
+        try:
+            return self.get_response(request)
+        finally:
+            current_view.reset(token)
+            save_slow_queries()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current_view.set(view_labels(request))
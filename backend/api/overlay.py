@@ -0,0 +1,47 @@
+"""Пользовательские поля поверх общего для всех ответа с рецептами."""
+from reviews.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+
+def apply_viewer_overlay(recipes, user):
+    """
+    Проставляет is_favorited, is_in_shopping_cart и author.is_subscribed
+    в сериализованные без учета пользователя рецепты.
+    Выполняет по одному запросу на избранное, список покупок
+    и подписки, ограниченному рецептами и авторами страницы;
+    поля, которых нет в ответе, не запрашиваются.
+    """
+    if not user.is_authenticated or not recipes:
+        return recipes
+    recipe_ids = [recipe['id'] for recipe in recipes]
+    overlay = {}
+    if 'is_favorited' in recipes[0]:
+        overlay['is_favorited'] = set(Favorite.objects.filter(
+            author=user, recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True))
+    if 'is_in_shopping_cart' in recipes[0]:
+        overlay['is_in_shopping_cart'] = set(ShoppingCart.objects.filter(
+            author=user, recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True))
+    subscribed = None
+    if 'author' in recipes[0]:
+        subscribed = set(Subscription.objects.filter(
+            user=user,
+            author_id__in={recipe['author']['id'] for recipe in recipes}
+        ).values_list('author_id', flat=True))
+    result = []
+    for recipe in recipes:
+        recipe = {
+            **recipe,
+            **{
+                name: recipe['id'] in ids
+                for name, ids in overlay.items()
+            }
+        }
+        if subscribed is not None:
+            recipe['author'] = {
+                **recipe['author'],
+                'is_subscribed': recipe['author']['id'] in subscribed,
+            }
+        result.append(recipe)
+    return result
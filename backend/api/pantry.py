@@ -0,0 +1,181 @@
+"""
+Поиск рецептов по имеющимся ингредиентам.
+Обратный индекс «ингредиент → строки рецептов» хранится в памяти
+процесса в виде отсортированных массивов numpy; покрытие рецептов
+считается одним bincount по спискам выбранных ингредиентов.
+"""
+import datetime
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .cache import get_catalogue_version
+from reviews.models import IngredientRecipe, Recipe
+
+
+class IngredientIndex:
+    """
+    Обратный индекс ингредиентов рецептов.
+    Измененный рецепт получает новую строку, а старая помечается
+    удаленной (число ингредиентов 0); когда удаленных строк
+    становится больше четверти, индекс перестраивается.
+    Скрытые рецепты в индекс не попадают. В другом процессе изменения
+    подхватываются при смене общей версии каталога: перечитываются
+    рецепты с updated_at после прошлого обновления. Рецепты, удаленные
+    в другом процессе без скрытия, убираются из индекса при сборке
+    ответа (remove_recipes).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._loaded = False
+            self._version = None
+            self._refreshed_at = None
+            self.recipe_ids = np.zeros(0, dtype=np.int64)
+            self.counts = np.zeros(0, dtype=np.int32)
+            self.postings = {}
+            self.rows = {}
+
+    def load_pairs(self, pairs):
+        """Строит индекс по массиву пар (recipe_id, ingredient_id)."""
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        keys = np.unique(pairs[:, 0] << 32 | pairs[:, 1])
+        pairs = np.stack((keys >> 32, keys & 0xFFFFFFFF), axis=1)
+        recipe_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+        rows = rows.astype(np.int32)
+        order = np.argsort(pairs[:, 1], kind='stable')
+        ingredients, starts = np.unique(
+            pairs[order, 1], return_index=True)
+        self.recipe_ids = recipe_ids
+        self.counts = np.bincount(
+            rows, minlength=len(recipe_ids)).astype(np.int32)
+        self.postings = dict(zip(
+            ingredients.tolist(), np.split(rows[order], starts[1:])
+        ))
+        self.rows = dict(zip(recipe_ids.tolist(), range(len(recipe_ids))))
+
+    def load(self):
+        self._version = get_catalogue_version()
+        self._refreshed_at = timezone.now()
+        self.load_pairs(list(
+            IngredientRecipe.objects.filter(
+                recipe__is_hidden=False
+            ).order_by().values_list(
+                'recipe_id', 'ingredient_id'
+            ).iterator(chunk_size=10000)
+        ))
+        self._loaded = True
+
+    def _remove(self, recipe_id):
+        row = self.rows.pop(recipe_id, None)
+        if row is not None:
+            self.counts[row] = 0
+
+    def _add(self, recipe_id, ingredient_ids):
+        ingredient_ids = set(ingredient_ids)
+        if not ingredient_ids:
+            return
+        row = len(self.recipe_ids)
+        self.recipe_ids = np.append(self.recipe_ids, recipe_id)
+        self.counts = np.append(self.counts, len(ingredient_ids))
+        self.rows[recipe_id] = row
+        for ingredient_id in ingredient_ids:
+            self.postings[ingredient_id] = np.append(
+                self.postings.get(ingredient_id, []), row
+            ).astype(np.int32)
+
+    def update_recipes(self, recipe_ids):
+        """
+        Перечитывает ингредиенты рецептов из базы; скрытые
+        и удаленные рецепты убираются из индекса. Пока индекс
+        не загружен, база не запрашивается.
+        """
+        if not self._loaded:
+            return
+        recipe_ids = set(recipe_ids)
+        ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+        for recipe_id, ingredient_id in IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids, recipe__is_hidden=False
+        ).order_by().values_list('recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].append(ingredient_id)
+        with self._lock:
+            if not self._loaded:
+                return
+            for recipe_id, ingredient_ids in ingredients.items():
+                self._remove(recipe_id)
+                self._add(recipe_id, ingredient_ids)
+            self._compact()
+
+    def remove_recipes(self, recipe_ids):
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._remove(recipe_id)
+            self._compact()
+
+    def _compact(self):
+        if len(self.recipe_ids) > len(self.rows) * 5 // 4:
+            self._loaded = False
+
+    def refresh(self):
+        """Загружает индекс или подтягивает изменения каталога."""
+        version = get_catalogue_version()
+        if self._loaded and version == self._version:
+            return
+        with self._lock:
+            if not self._loaded:
+                self.load()
+                return
+            since = self._refreshed_at - datetime.timedelta(
+                seconds=settings.PANTRY_INDEX_REFRESH_OVERLAP)
+            self._version = version
+            self._refreshed_at = timezone.now()
+        self.update_recipes(Recipe.objects.filter(
+            updated_at__gte=since
+        ).values_list('id', flat=True))
+
+    def match(self, ingredient_ids, max_missing=0, limit=None):
+        """Ищет рецепты по актуальному индексу."""
+        self.refresh()
+        return self.search(ingredient_ids, max_missing, limit)
+
+    def search(self, ingredient_ids, max_missing=0, limit=None):
+        """
+        Возвращает тройки (recipe_id, найдено ингредиентов, всего
+        ингредиентов) для рецептов, которым не хватает не более
+        max_missing ингредиентов. Сначала идут рецепты с меньшим
+        числом недостающих ингредиентов, затем с большим покрытием.
+        """
+        with self._lock:
+            lists = [
+                self.postings[ingredient_id]
+                for ingredient_id in set(ingredient_ids)
+                if ingredient_id in self.postings
+            ]
+            if not lists:
+                return []
+            counts = self.counts
+            recipe_ids = self.recipe_ids
+        matched = np.bincount(np.concatenate(lists), minlength=len(counts))
+        missing = counts - matched
+        candidates = np.flatnonzero(
+            (matched > 0) & (counts > 0) & (missing <= max_missing))
+        order = np.lexsort((
+            recipe_ids[candidates],
+            -matched[candidates] / counts[candidates],
+            missing[candidates],
+        ))[:limit]
+        candidates = candidates[order]
+        return list(zip(
+            recipe_ids[candidates].tolist(),
+            matched[candidates].tolist(),
+            counts[candidates].tolist()
+        ))
+
+
+ingredient_index = IngredientIndex()
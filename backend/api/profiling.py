@@ -0,0 +1,118 @@
+"""
+Профилирование отдельного запроса по требованию сотрудника.
+Профиль включается подписанным заголовком X-Profile-Token
+или параметром _profile для вошедшего в админку сотрудника.
+cProfile охватывает всю обработку запроса: аутентификацию,
+сериализаторы, ORM и рендеринг ответа. Профили пишутся в файлы
+кольца из PROFILING_MAX_FILES последних в каталоге PROFILING_DIR.
+"""
+import cProfile
+import io
+import os
+import pstats
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import connection
+
+from reviews.models import RequestProfile
+
+User = get_user_model()
+
+PROFILE_HEADER = 'HTTP_X_PROFILE_TOKEN'
+PROFILE_PARAM = '_profile'
+TOKEN_SALT = 'api.profiling'
+
+
+def make_profile_token(user):
+    return signing.dumps(user.pk, salt=TOKEN_SALT)
+
+
+def profiling_user(request):
+    """
+    Возвращает сотрудника, запросившего профилирование, или None.
+    Обычный запрос проверяет только наличие заголовка и параметра.
+    """
+    token = request.META.get(PROFILE_HEADER)
+    if token is not None:
+        try:
+            user_id = signing.loads(
+                token, salt=TOKEN_SALT,
+                max_age=settings.PROFILING_TOKEN_MAX_AGE)
+        except signing.BadSignature:
+            return None
+        return User.objects.filter(
+            pk=user_id, is_staff=True, is_active=True).first()
+    if PROFILE_PARAM in request.GET and request.user.is_staff:
+        return request.user
+    return None
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def profile_path(file_name):
+    return os.path.join(settings.PROFILING_DIR, file_name)
+
+
+def profile_request(request, get_response, user):
+    """Обрабатывает запрос под cProfile и сохраняет профиль."""
+    profiler = cProfile.Profile()
+    counter = QueryCounter()
+    started = time.perf_counter()
+    with connection.execute_wrapper(counter):
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+    duration = time.perf_counter() - started
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    file_name = f'{time.time_ns()}-{os.getpid()}.prof'
+    profiler.dump_stats(profile_path(file_name))
+    profile = RequestProfile.objects.create(
+        user=user,
+        method=request.method,
+        path=request.get_full_path()[:255],
+        status=response.status_code,
+        duration=duration,
+        queries=counter.count,
+        file_name=file_name,
+    )
+    prune_profiles()
+    response['X-Profile-Id'] = str(profile.pk)
+    return response
+
+
+def prune_profiles():
+    """Удаляет профили сверх PROFILING_MAX_FILES последних."""
+    stale = RequestProfile.objects.order_by(
+        '-created_at', '-id'
+    ).values_list('id', flat=True)[settings.PROFILING_MAX_FILES:]
+    RequestProfile.objects.filter(id__in=list(stale)).delete()
+
+
+def remove_profile_file(file_name):
+    try:
+        os.remove(profile_path(file_name))
+    except FileNotFoundError:
+        pass
+
+
+def profile_summary(file_name, limit=40):
+    """Текстовая сводка профиля по накопленному времени."""
+    output = io.StringIO()
+    try:
+        stats = pstats.Stats(profile_path(file_name), stream=output)
+    except FileNotFoundError:
+        return 'Файл профиля не найден'
+    stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+    return output.getvalue()
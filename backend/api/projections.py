@@ -0,0 +1,151 @@
+"""
+Сборка ответа с рецептами напрямую из values()-запросов,
+без создания экземпляров моделей и обхода полей сериализатора.
+Форма ответа совпадает с RecipeReadSerializer при context['shared'].
+"""
+from django.core.files.storage import default_storage
+
+from reviews.models import IngredientRecipe, Recipe
+
+RECIPE_OUTPUT_FIELDS = (
+    'id',
+    'tags',
+    'author',
+    'ingredients',
+    'is_favorited',
+    'is_in_shopping_cart',
+    'name',
+    'image',
+    'text',
+    'cooking_time',
+)
+AUTHOR_FIELDS = (
+    'author_id',
+    'author__email',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'author__avatar',
+)
+
+
+def file_url(name, request):
+    if not name:
+        return None
+    url = default_storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def project_tags(recipe_ids):
+    tags = {recipe_id: [] for recipe_id in recipe_ids}
+    for recipe_id, tag_id, name, slug in Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('tag__name').values_list(
+        'recipe_id', 'tag_id', 'tag__name', 'tag__slug'
+    ):
+        tags[recipe_id].append({'id': tag_id, 'name': name, 'slug': slug})
+    return tags
+
+
+def project_ingredients(recipe_ids):
+    ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+    for recipe_id, ingredient_id, name, unit, amount in (
+        IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('pk').values_list(
+            'recipe_id',
+            'ingredient_id',
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            'amount'
+        )
+    ):
+        ingredients[recipe_id].append({
+            'id': ingredient_id,
+            'name': name,
+            'measurement_unit': unit,
+            'amount': amount,
+        })
+    return ingredients
+
+
+def project_recipes(recipe_ids, request=None, fields=RECIPE_OUTPUT_FIELDS):
+    """
+    Возвращает список рецептов с переданными id в том же порядке.
+    Выполняет до трех запросов: рецепты с авторами, теги и ингредиенты;
+    запросы и столбцы для полей, не вошедших в fields, пропускаются.
+    """
+    if not recipe_ids:
+        return []
+    columns = ['id'] + [
+        name for name in ('name', 'image', 'text', 'cooking_time')
+        if name in fields
+    ]
+    if 'author' in fields:
+        columns.extend(AUTHOR_FIELDS)
+    rows = {
+        row['id']: row
+        for row in Recipe.objects.filter(
+            pk__in=recipe_ids, is_hidden=False
+        ).order_by().values(*columns)
+    }
+    related = {}
+    if 'tags' in fields:
+        related['tags'] = project_tags(rows)
+    if 'ingredients' in fields:
+        related['ingredients'] = project_ingredients(rows)
+
+    def build(row, name):
+        if name in related:
+            return related[name][row['id']]
+        if name == 'author':
+            return {
+                'email': row['author__email'],
+                'id': row['author_id'],
+                'username': row['author__username'],
+                'first_name': row['author__first_name'],
+                'last_name': row['author__last_name'],
+                'is_subscribed': False,
+                'avatar': file_url(row['author__avatar'], request),
+            }
+        if name in ('is_favorited', 'is_in_shopping_cart'):
+            return False
+        if name == 'image':
+            return file_url(row['image'], request)
+        return row[name]
+
+    return [
+        {name: build(row, name) for name in fields}
+        for row in map(rows.get, recipe_ids)
+        if row is not None
+    ]
+
+
+def sideload_recipes(recipes):
+    """
+    Переводит рецепты в компактную форму: вместо вложенных
+    автора и тегов рецепт ссылается на author_id и id тегов,
+    а сами авторы и теги возвращаются один раз в included.
+    """
+    authors = {}
+    tags = {}
+    results = []
+    for recipe in recipes:
+        recipe = dict(recipe)
+        if 'author' in recipe:
+            author = recipe.pop('author')
+            authors.setdefault(author['id'], author)
+            recipe['author_id'] = author['id']
+        if 'tags' in recipe:
+            for tag in recipe['tags']:
+                tags.setdefault(tag['id'], tag)
+            recipe['tags'] = [tag['id'] for tag in recipe['tags']]
+        results.append(recipe)
+    included = {}
+    if authors:
+        included['authors'] = list(authors.values())
+    if tags:
+        included['tags'] = list(tags.values())
+    return results, included
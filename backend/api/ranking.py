@@ -0,0 +1,150 @@
+"""
+Популярность и трендовость рецептов.
+Добавление в избранное или список покупок дает рецепту вес,
+затухающий с периодом полураспада half_life. Веса хранятся
+в масштабе точки отсчета (начала последнего пересчета):
+weight * 2 ** ((t - epoch) / half_life), так что порядок рецептов
+со временем не меняется и добавление — это один UPDATE без
+пересчета остальных рецептов. Периодический пересчет учитывает
+только события внутри окна window, убирает удаленные из списков
+рецепты и сдвигает точку отсчета. Точка отсчета хранится в базе
+как начало последнего RankingRun и общая для всех процессов.
+"""
+import datetime
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .cache import bump_catalogue_version, get_catalogue_version
+from reviews.models import Favorite, RankingRun, Recipe, ShoppingCart
+
+# Предел показателя степени: если пересчет долго не запускался,
+# вес новых событий перестает расти, но не переполняет float.
+MAX_EXPONENT = 512
+RANKING_ORDERINGS = {
+    'popular': ('-popularity', '-pub_date'),
+    'trending': ('-trending', '-pub_date'),
+}
+
+
+_epoch = {'value': None, 'version': None, 'expires': 0.0}
+
+
+def get_epoch():
+    """
+    Возвращает начало последнего пересчета. Значение перечитывается
+    из базы при смене версии каталога (пересчет повышает ее после
+    фиксации) и не реже раза в RANKING_EPOCH_TTL секунд. До первого
+    пересчета точкой отсчета становится пустой пересчет, созданный
+    сейчас.
+    """
+    now = time.monotonic()
+    version = get_catalogue_version()
+    if (
+        _epoch['value'] is None
+        or _epoch['version'] != version
+        or now >= _epoch['expires']
+    ):
+        epoch = RankingRun.objects.values_list(
+            'started_at', flat=True).first()
+        if epoch is None:
+            epoch = RankingRun.objects.create(
+                started_at=timezone.now(), duration=0, recipes_scored=0
+            ).started_at
+        _epoch['value'] = epoch
+        _epoch['version'] = version
+        _epoch['expires'] = now + settings.RANKING_EPOCH_TTL
+    return _epoch['value']
+
+
+def forget_epoch():
+    _epoch['value'] = None
+
+
+def record_additions(model, recipe_ids):
+    """Добавляет рецептам вес новых записей в избранном или корзине."""
+    if not recipe_ids:
+        return
+    weight = settings.RANKING_WEIGHTS[model._meta.model_name]
+    elapsed = (timezone.now() - get_epoch()).total_seconds()
+    Recipe.objects.filter(pk__in=recipe_ids).update(**{
+        name: F(name) + weight * 2 ** min(
+            elapsed / score['half_life'], MAX_EXPONENT)
+        for name, score in settings.RANKING_SCORES.items()
+    })
+
+
+def event_ages(model, started_at, window):
+    """Возвращает id рецептов и возраст (в секундах) записей окна."""
+    rows = np.array(list(model.objects.filter(
+        created_at__gte=started_at - datetime.timedelta(seconds=window)
+    ).order_by().values_list('recipe_id', 'created_at').iterator(
+        chunk_size=10000
+    )), dtype=object).reshape(-1, 2)
+    return (
+        rows[:, 0].astype(np.int64),
+        np.fromiter(
+            ((started_at - created_at).total_seconds()
+             for created_at in rows[:, 1]),
+            dtype=np.float64,
+            count=len(rows)
+        )
+    )
+
+
+def refresh_rankings():
+    """Пересчитывает рейтинги всех рецептов по событиям внутри окон."""
+    started_at = timezone.now()
+    started = time.perf_counter()
+    window = max(score['window'] for score in settings.RANKING_SCORES.values())
+    recipe_ids, ages, weights = [], [], []
+    for model in (Favorite, ShoppingCart):
+        model_recipe_ids, model_ages = event_ages(model, started_at, window)
+        recipe_ids.append(model_recipe_ids)
+        ages.append(model_ages)
+        weights.append(np.full(
+            len(model_ages), settings.RANKING_WEIGHTS[model._meta.model_name]
+        ))
+    recipe_ids, rows = np.unique(
+        np.concatenate(recipe_ids), return_inverse=True)
+    ages = np.concatenate(ages)
+    weights = np.concatenate(weights)
+    scores = {
+        name: np.bincount(
+            rows,
+            weights=np.where(
+                ages <= score['window'],
+                weights * 2 ** (-ages / score['half_life']),
+                0
+            ),
+            minlength=len(recipe_ids)
+        )
+        for name, score in settings.RANKING_SCORES.items()
+    }
+    with transaction.atomic():
+        Recipe.objects.filter(
+            Q(popularity__gt=0) | Q(trending__gt=0)
+        ).update(**{name: 0 for name in scores})
+        Recipe.objects.bulk_update(
+            [
+                Recipe(pk=recipe_id, **{
+                    name: float(values[row])
+                    for name, values in scores.items()
+                })
+                for row, recipe_id in enumerate(recipe_ids.tolist())
+            ],
+            list(scores),
+            batch_size=1000
+        )
+        run = RankingRun.objects.create(
+            started_at=started_at,
+            duration=time.perf_counter() - started,
+            recipes_scored=len(recipe_ids)
+        )
+        transaction.on_commit(forget_epoch)
+        transaction.on_commit(bump_catalogue_version)
+    return run
@@ -0,0 +1,43 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на основе orjson.
+    Выдает те же байты, что и стандартный JSONRenderer
+    (компактный вывод без экранирования не-ASCII символов);
+    для отступов и неподдерживаемых orjson данных используется
+    стандартная реализация. Исключение — числа с плавающей точкой:
+    показатель степени пишется короче (1e16 вместо 1e+16, 1.5e-7
+    вместо 1.5e-07), числа от 1e-7 до 1e-4 — без показателя
+    (0.00001 вместо 1e-05), а NaN и бесконечности выводятся как null
+    вместо ValueError. Значения при разборе совпадают; ответы API
+    таких чисел не содержат, а проверка каждого ответа обошлась бы
+    дороже самой сериализации.
+    """
+    encoder = JSONRenderer.encoder_class()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder.default,
+                option=ORJSON_OPTIONS
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(
+                b'\xe2\x80\xa8', b'\\u2028'
+            ).replace(
+                b'\xe2\x80\xa9', b'\\u2029'
+            )
+        return ret
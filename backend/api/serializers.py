@@ -1,29 +1,104 @@
 import base64
+import time
 
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
 from django.db import transaction
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
+from rest_framework.relations import MANY_RELATION_KWARGS
 
-from reviews.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, Tag)
-from users.models import Subscription
+from .constants import BATCH_MAX_REQUESTS, BULK_MAX_IDS
+from .fieldsets import requested_fields
+from .metrics import IMAGE_DURATION
+from reviews.models import Ingredient, IngredientRecipe, Recipe, Tag
 
 User = get_user_model()
 
 
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
+        started = time.perf_counter()
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
             ext = format.split('/')[-1]
             data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
-        return super().to_internal_value(data)
+        try:
+            return super().to_internal_value(data)
+        finally:
+            IMAGE_DURATION.observe(
+                time.perf_counter() - started, ('decode',))
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """
+    Список первичных ключей, который проверяется одним запросом
+    вместо отдельного запроса на каждый элемент.
+    """
+    default_error_messages = {
+        **serializers.ManyRelatedField.default_error_messages,
+        'does_not_exist': 'Объекты с id {pk_values} не существуют.',
+    }
 
-
-class ExtendedUserSerializer(UserSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        pks = []
+        for item in data:
+            if isinstance(item, bool) or not isinstance(item, (int, str)):
+                self.child_relation.fail(
+                    'incorrect_type', data_type=type(item).__name__)
+            try:
+                pks.append(int(item))
+            except ValueError:
+                self.child_relation.fail(
+                    'incorrect_type', data_type=type(item).__name__)
+        objects = self.child_relation.get_queryset().in_bulk(pks)
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in objects]
+        if missing:
+            self.fail(
+                'does_not_exist',
+                pk_values=', '.join(map(str, missing))
+            )
+        return [objects[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField, который при many=True
+    проверяет все ключи одним запросом.
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+
+class SparseFieldsMixin:
+    """
+    Оставляет в ответе только поля, выбранные параметрами
+    запроса fields= и omit=. Применяется к сериализатору верхнего
+    уровня; методы невыбранных полей не вызываются.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return fields
+        selected = requested_fields(self.context.get('request'), fields)
+        return {name: fields[name] for name in selected}
+
+
+class ExtendedUserSerializer(SparseFieldsMixin, UserSerializer):
     avatar = Base64ImageField(required=False, use_url=True)
     is_subscribed = serializers.SerializerMethodField()
 
@@ -43,6 +118,7 @@ class ExtendedUserSerializer(UserSerializer):
         request = self.context.get('request')
         return bool(
             request
+            and not self.context.get('shared')
             and request.user.is_authenticated
             and obj.subscribers.filter(user=request.user).exists()
         )
@@ -64,7 +140,7 @@ class RecipeSubscribeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'cooking_time', 'image')
 
 
-class SubscriptionsSerializer(UserSerializer):
+class SubscriptionsSerializer(SparseFieldsMixin, UserSerializer):
     avatar = Base64ImageField(required=False, allow_null=True, use_url=True)
     recipes = serializers.SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField()
@@ -87,7 +163,7 @@ class SubscriptionsSerializer(UserSerializer):
     def get_recipes(self, obj):
         request = self.context.get('request')
         recipes_limit = request.query_params.get('recipes_limit')
-        queryset = obj.recipes.all().order_by('-pub_date')
+        queryset = obj.recipes.filter(is_hidden=False).order_by('-pub_date')
         if recipes_limit and recipes_limit.isdigit():
             queryset = queryset[:int(recipes_limit)]
         return RecipeSubscribeSerializer(
@@ -97,9 +173,15 @@ class SubscriptionsSerializer(UserSerializer):
         ).data
 
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        recipes_count = getattr(obj, 'recipes_count', None)
+        if recipes_count is not None:
+            return recipes_count
+        return obj.recipes.filter(is_hidden=False).count()
 
     def get_is_subscribed(self, obj):
+        is_subscribed = getattr(obj, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
         request = self.context.get('request')
         return bool(
             request
@@ -108,37 +190,6 @@ class SubscriptionsSerializer(UserSerializer):
         )
 
 
-class SubscribeSerializer(serializers.ModelSerializer):
-    author = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
-    user = serializers.PrimaryKeyRelatedField(
-        default=serializers.CurrentUserDefault(),
-        queryset=User.objects.all()
-    )
-
-    class Meta:
-        fields = ('user', 'author')
-        model = Subscription
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Subscription.objects.all(),
-                fields=['user', 'author'],
-                message='Вы уже подписаны на этого пользователя!'
-            )
-        ]
-
-    def validate(self, data):
-        if data['user'] == data['author']:
-            raise serializers.ValidationError(
-                'Вы не можете подписаться на себя!')
-        return data
-
-    def to_representation(self, instance):
-        return SubscriptionsSerializer(
-            instance.author,
-            context=self.context
-        ).data
-
-
 class IngredientSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -146,15 +197,37 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
+class IngredientInputListSerializer(serializers.ListSerializer):
+    """
+    Заменяет id ингредиентов на объекты Ingredient,
+    получая их все одним запросом.
+    """
+
+    def validate(self, attrs):
+        ingredient_ids = [item['id'] for item in attrs]
+        ingredients = Ingredient.objects.in_bulk(ingredient_ids)
+        missing = [
+            ingredient_id for ingredient_id in dict.fromkeys(ingredient_ids)
+            if ingredient_id not in ingredients
+        ]
+        if missing:
+            raise serializers.ValidationError(
+                'Ингредиенты с id {} не существуют.'.format(
+                    ', '.join(map(str, missing))
+                )
+            )
+        for item in attrs:
+            item['id'] = ingredients[item['id']]
+        return attrs
+
+
 class IngredientInputSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        required=True,
-        queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField(required=True)
 
     class Meta:
         model = IngredientRecipe
         fields = ('id', 'amount')
+        list_serializer_class = IngredientInputListSerializer
 
 
 class IngredientRecipeOutputSerializer(serializers.ModelSerializer):
@@ -176,7 +249,7 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'slug')
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     image = Base64ImageField(required=False, allow_null=True, use_url=True)
     author = ExtendedUserSerializer()
     tags = TagSerializer(many=True)
@@ -213,6 +286,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         return bool(
             request
+            and not self.context.get('shared')
             and request.user.is_authenticated
             and obj.favorites.filter(author=request.user).exists()
         )
@@ -221,6 +295,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         return bool(
             request
+            and not self.context.get('shared')
             and request.user.is_authenticated
             and obj.shopping_carts.filter(author=request.user).exists()
         )
@@ -229,7 +304,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 class RecipeSerializer(serializers.ModelSerializer):
     image = Base64ImageField(required=True, use_url=True)
     author = ExtendedUserSerializer(required=False)
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         required=True,
         many=True,
         queryset=Tag.objects.all()
@@ -310,12 +385,42 @@ class RecipeSerializer(serializers.ModelSerializer):
         self._create_ingredients(recipe, ingredients_data)
         return recipe
 
+    def _update_ingredients(self, recipe, ingredients_data):
+        """
+        Приводит ингредиенты рецепта к переданному списку,
+        не трогая строки, которые не изменились.
+        """
+        existing = {
+            relation.ingredient_id: relation
+            for relation in recipe.ingredients_relations.all()
+        }
+        to_create = []
+        to_update = []
+        for ingredient in ingredients_data:
+            relation = existing.pop(ingredient['id'].id, None)
+            if relation is None:
+                to_create.append(IngredientRecipe(
+                    recipe=recipe,
+                    ingredient=ingredient['id'],
+                    amount=ingredient['amount']
+                ))
+            elif relation.amount != ingredient['amount']:
+                relation.amount = ingredient['amount']
+                to_update.append(relation)
+        if existing:
+            IngredientRecipe.objects.filter(
+                pk__in=[relation.pk for relation in existing.values()]
+            ).delete()
+        if to_update:
+            IngredientRecipe.objects.bulk_update(to_update, ['amount'])
+        if to_create:
+            IngredientRecipe.objects.bulk_create(to_create)
+
     @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients', [])
         tags_data = validated_data.pop('tags', [])
-        instance.ingredients_relations.all().delete()
-        self._create_ingredients(instance, ingredients_data)
+        self._update_ingredients(instance, ingredients_data)
         instance.tags.set(tags_data)
         return super().update(instance, validated_data)
 
@@ -328,41 +433,34 @@ class FavoriteShoppingCartSerializer(serializers.ModelSerializer):
         model = Recipe
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class RecipeIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_IDS
+    )
 
-    class Meta:
-        fields = ('author', 'recipe')
-        model = Favorite
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Favorite.objects.all(),
-                fields=['author', 'recipe'],
-                message='Этот рецепт уже добавлен в избранное!'
-            )
-        ]
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
 
-    def to_representation(self, instance):
-        return FavoriteShoppingCartSerializer(
-            instance.recipe,
-            context=self.context
-        ).data
 
+class BatchItemSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(
+        choices=('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+    )
+    url = serializers.CharField()
+    body = serializers.JSONField(required=False)
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
+    def validate_url(self, value):
+        if not value.startswith('/api/'):
+            raise serializers.ValidationError(
+                'Поддерживаются только адреса /api/.')
+        return value
 
-    class Meta:
-        fields = ('author', 'recipe')
-        model = ShoppingCart
-        validators = [
-            UniqueTogetherValidator(
-                queryset=ShoppingCart.objects.all(),
-                fields=['author', 'recipe'],
-                message='Этот рецепт уже добавлен в список покупок!'
-            )
-        ]
 
-    def to_representation(self, instance):
-        return FavoriteShoppingCartSerializer(
-            instance.recipe,
-            context=self.context
-        ).data
+class BatchSerializer(serializers.Serializer):
+    requests = BatchItemSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=BATCH_MAX_REQUESTS
+    )
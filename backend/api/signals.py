@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .cache import bump_catalogue_version
+from .feed import backfill_timeline, fan_out_recipe
+from .pantry import ingredient_index
+from .profiling import remove_profile_file
+from .slow_queries import install_wrapper
+from reviews.models import (Ingredient, IngredientRecipe, Recipe,
+                            RequestProfile, Tag)
+from users.models import Subscription
+
+User = get_user_model()
+
+
+def catalogue_changed(sender, **kwargs):
+    transaction.on_commit(bump_catalogue_version)
+
+
+for model in (Recipe, Tag, Ingredient, IngredientRecipe):
+    post_save.connect(catalogue_changed, sender=model)
+    post_delete.connect(catalogue_changed, sender=model)
+m2m_changed.connect(catalogue_changed, sender=Recipe.tags.through)
+post_delete.connect(catalogue_changed, sender=User)
+
+# Поля пользователя, которые показываются в рецептах и каталоге.
+AUTHOR_FIELDS = {
+    'email', 'username', 'first_name', 'last_name', 'avatar', 'is_active',
+}
+
+
+def author_changing(sender, instance, update_fields=None, **kwargs):
+    """
+    При полном сохранении существующего пользователя сравнивает
+    показываемые поля с базой, чтобы вход в систему и смена пароля
+    не сбрасывали кэш каталога.
+    """
+    if instance.pk is None or update_fields is not None:
+        return
+    old = User.objects.filter(pk=instance.pk).values(*AUTHOR_FIELDS).first()
+    instance._author_changed = old is not None and any(
+        instance._meta.get_field(field).get_prep_value(
+            getattr(instance, field)) != value
+        for field, value in old.items()
+    )
+
+
+def author_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None:
+        changed = bool(AUTHOR_FIELDS & set(update_fields))
+    else:
+        changed = getattr(instance, '_author_changed', False)
+    if changed:
+        transaction.on_commit(bump_catalogue_version)
+
+
+pre_save.connect(author_changing, sender=User)
+post_save.connect(author_saved, sender=User)
+
+
+def token_deleted(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+def user_changed(sender, instance, **kwargs):
+    keys = ()
+    if settings.TOKEN_CACHE_ALIAS:
+        keys = Token.objects.filter(
+            user_id=instance.pk).values_list('key', flat=True)
+    token_cache.invalidate_user(instance.pk, keys)
+
+
+post_delete.connect(token_deleted, sender=Token)
+post_save.connect(user_changed, sender=User)
+post_delete.connect(user_changed, sender=User)
+
+
+def recipe_published(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: fan_out_recipe(instance))
+
+
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: backfill_timeline(
+            instance.user_id, instance.author_id))
+
+
+post_save.connect(recipe_published, sender=Recipe)
+post_save.connect(subscription_created, sender=Subscription)
+
+
+def recipe_saved(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: ingredient_index.update_recipes([instance.pk]))
+
+
+def recipe_deleted(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: ingredient_index.remove_recipes([instance.pk]))
+
+
+post_save.connect(recipe_saved, sender=Recipe)
+post_delete.connect(recipe_deleted, sender=Recipe)
+
+
+def request_profile_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: remove_profile_file(instance.file_name))
+
+
+post_delete.connect(request_profile_deleted, sender=RequestProfile)
+
+
+connection_created.connect(install_wrapper)
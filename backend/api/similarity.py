@@ -0,0 +1,190 @@
+"""
+Предвычисление похожих рецептов.
+Каталог представляется разреженной матрицей «рецепт × ингредиент»
+с весами idf, сходство считается косинусом по блокам строк;
+теги добавляются к сходству найденных кандидатов с весом
+SIMILAR_RECIPES_TAG_WEIGHT. Для каждого рецепта сохраняются
+SIMILAR_RECIPES_TOP_K лучших соседей в таблицу SimilarRecipe.
+"""
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from scipy import sparse
+
+from reviews.models import (IngredientRecipe, Recipe, SimilarityRun,
+                            SimilarRecipe)
+
+
+def normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))).ravel()
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+def incidence_matrix(recipe_ids, pairs):
+    """
+    Строит разреженную матрицу вхождений по парам (recipe_id, column_id):
+    строки идут в порядке recipe_ids, столбцы — по возрастанию column_id.
+    Пары рецептов, которых нет в recipe_ids (созданных или удаленных
+    между запросами), пропускаются.
+    """
+    pairs = np.array(list(pairs), dtype=np.int64).reshape(-1, 2)
+    rows = np.searchsorted(recipe_ids, pairs[:, 0])
+    found = rows < len(recipe_ids)
+    found[found] = recipe_ids[rows[found]] == pairs[found, 0]
+    pairs, rows = pairs[found], rows[found]
+    columns, column_index = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (
+            np.ones(len(pairs), dtype=np.float32),
+            (rows, column_index)
+        ),
+        shape=(len(recipe_ids), len(columns))
+    )
+    matrix.data[:] = 1
+    return matrix
+
+
+def build_features(recipe_ids):
+    """
+    Возвращает нормированные матрицы ингредиентов (с весами idf)
+    и тегов для рецептов recipe_ids.
+    """
+    ingredients = incidence_matrix(
+        recipe_ids,
+        IngredientRecipe.objects.filter(
+            recipe_id__lte=int(recipe_ids[-1])
+        ).order_by().values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator(chunk_size=10000)
+    )
+    frequency = np.bincount(ingredients.indices,
+                            minlength=ingredients.shape[1])
+    idf = np.log1p(len(recipe_ids) / np.maximum(frequency, 1))
+    ingredients = normalize_rows(
+        ingredients @ sparse.diags(idf.astype(np.float32))
+    ).tocsr()
+    tags = normalize_rows(incidence_matrix(
+        recipe_ids,
+        Recipe.tags.through.objects.filter(
+            recipe_id__lte=int(recipe_ids[-1])
+        ).order_by().values_list(
+            'recipe_id', 'tag_id'
+        ).iterator(chunk_size=10000)
+    )).toarray()
+    return ingredients, tags
+
+
+def top_neighbours(ingredients, tags, rows, top_k, chunk_size):
+    """
+    Для строк rows выдает тройки (строка, строки соседей, сходство),
+    соседи упорядочены по убыванию сходства. Произведение матриц
+    считается блоками по chunk_size строк, чтобы ограничить память.
+    """
+    transposed = ingredients.T.tocsr()
+    tag_weight = settings.SIMILAR_RECIPES_TAG_WEIGHT
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        scores = (ingredients[chunk] @ transposed).tocsr()
+        for position, row in enumerate(chunk):
+            begin, end = scores.indptr[position:position + 2]
+            candidates = scores.indices[begin:end]
+            values = scores.data[begin:end]
+            own = candidates != row
+            candidates, values = candidates[own], values[own]
+            values = (
+                (1 - tag_weight) * values
+                + tag_weight * (tags[candidates] @ tags[row])
+            )
+            if len(values) > top_k:
+                best = np.argpartition(-values, top_k)[:top_k]
+                candidates, values = candidates[best], values[best]
+            order = np.lexsort((candidates, -values))
+            yield row, candidates[order], values[order]
+
+
+def save_neighbours(recipe_ids, neighbours):
+    """Заменяет сохраненных соседей у пересчитанных рецептов."""
+    rows = []
+    updated = []
+    for row, candidates, values in neighbours:
+        recipe_id = int(recipe_ids[row])
+        updated.append(recipe_id)
+        rows.extend(
+            SimilarRecipe(
+                recipe_id=recipe_id,
+                similar_id=int(recipe_ids[candidate]),
+                score=float(value)
+            )
+            for candidate, value in zip(candidates, values)
+        )
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(recipe_id__in=updated).delete()
+        SimilarRecipe.objects.bulk_create(rows, batch_size=1000)
+    return updated
+
+
+def build_similar_recipes(full=False, top_k=None, chunk_size=None):
+    """
+    Пересчитывает похожие рецепты и возвращает запись SimilarityRun.
+    Без full пересчитываются только рецепты, измененные после
+    прошлого запуска, рецепты, у которых они были в соседях,
+    и их новые соседи. Скрытые рецепты, ожидающие удаления,
+    не бывают ни источниками, ни соседями.
+    """
+    top_k = top_k or settings.SIMILAR_RECIPES_TOP_K
+    chunk_size = chunk_size or settings.SIMILAR_RECIPES_CHUNK_SIZE
+    started_at = timezone.now()
+    started = time.perf_counter()
+    recipe_ids = np.fromiter(
+        Recipe.objects.filter(is_hidden=False).order_by('id').values_list(
+            'id', flat=True),
+        dtype=np.int64
+    )
+    last_run = SimilarityRun.objects.first()
+    full = full or last_run is None
+    SimilarRecipe.objects.filter(recipe__is_hidden=True).delete()
+    updated = set()
+    if len(recipe_ids):
+        ingredients, tags = build_features(recipe_ids)
+
+        def update(ids):
+            ids = np.setdiff1d(
+                np.fromiter(ids, dtype=np.int64), list(updated)
+            )
+            rows = np.searchsorted(recipe_ids, ids)
+            found = rows < len(recipe_ids)
+            rows = rows[found][recipe_ids[rows[found]] == ids[found]]
+            neighbours = list(top_neighbours(
+                ingredients, tags, rows, top_k, chunk_size
+            ))
+            for start in range(0, len(neighbours), chunk_size):
+                updated.update(save_neighbours(
+                    recipe_ids, neighbours[start:start + chunk_size]
+                ))
+            return {
+                int(recipe_ids[candidate])
+                for _, candidates, _ in neighbours
+                for candidate in candidates
+            }
+
+        if full:
+            update(recipe_ids)
+        else:
+            changed = set(Recipe.objects.filter(
+                updated_at__gte=last_run.started_at
+            ).values_list('id', flat=True))
+            referrers = set(SimilarRecipe.objects.filter(
+                similar_id__in=changed
+            ).values_list('recipe_id', flat=True))
+            update(changed | referrers | update(changed))
+    return SimilarityRun.objects.create(
+        started_at=started_at,
+        duration=time.perf_counter() - started,
+        full=full,
+        recipes_total=len(recipe_ids),
+        recipes_updated=len(updated)
+    )
@@ -0,0 +1,176 @@
+"""
+Журнал медленных SQL-запросов с привязкой к коду.
+Обертка выполнения запросов ставится на каждое соединение
+и для запросов дольше SLOW_QUERY_THRESHOLD запоминает
+представление и действие DRF, поле сериализатора, в котором
+выполнен запрос, укороченный стек и параметры со скрытыми
+секретами. Записи копятся в ограниченной очереди процесса
+и сохраняются в таблицу SlowQuery в конце запроса; таблица
+хранит SLOW_QUERY_LOG_SIZE последних записей.
+"""
+import contextvars
+import os
+import re
+import sys
+import time
+from collections import deque
+from itertools import cycle
+
+from django.conf import settings
+
+from reviews.models import SlowQuery
+
+REDACTED = '***'
+MAX_PARAM_LENGTH = 200
+
+current_view = contextvars.ContextVar('slow_query_view', default=('', ''))
+saving = contextvars.ContextVar('slow_query_saving', default=False)
+pending = deque(maxlen=settings.SLOW_QUERY_LOG_SIZE)
+
+PLACEHOLDER = re.compile(r'%s')
+COMPARED_COLUMN = re.compile(
+    r'(\w+)"?\s*(?:[=<>!]+|LIKE|IN\s*\((?:%s,\s*)*)\s*$', re.IGNORECASE)
+INSERT_COLUMNS = re.compile(
+    r'^\s*INSERT\s+INTO\s+\S+\s*\(([^)]*)\)', re.IGNORECASE)
+SECRET_VALUE = re.compile(r'^(?:[0-9a-f]{40}|\w+\$\d+\$.+)$')
+
+
+def placeholder_columns(sql):
+    """Имена столбцов, с которыми связаны плейсхолдеры, или None."""
+    insert = INSERT_COLUMNS.match(sql)
+    if insert:
+        columns = [
+            column.strip().strip('"`')
+            for column in insert.group(1).split(',')
+        ]
+        return cycle(columns)
+    return (
+        (COMPARED_COLUMN.search(sql, 0, match.start()) or [None, None])[1]
+        for match in PLACEHOLDER.finditer(sql)
+    )
+
+
+def clean_param(secret, column, value):
+    if column and secret.search(column):
+        return REDACTED
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    value = str(value)
+    if SECRET_VALUE.match(value):
+        return REDACTED
+    return value[:MAX_PARAM_LENGTH]
+
+
+def redact_params(sql, params):
+    """Параметры запроса с замененными секретами."""
+    if not params:
+        return []
+    secret = re.compile(settings.SLOW_QUERY_REDACT_PATTERN, re.IGNORECASE)
+    if isinstance(params, dict):
+        return {
+            name: clean_param(secret, name, value)
+            for name, value in params.items()
+        }
+    return [
+        clean_param(secret, column, value)
+        for column, value in zip(placeholder_columns(sql), params)
+    ]
+
+
+def serializer_field(frame):
+    """
+    Ищет ближайший к запросу кадр сериализатора и возвращает
+    метод (RecipeReadSerializer.get_is_favorited) или поле
+    (RecipeReadSerializer.tags), в котором выполнен запрос.
+    """
+    from rest_framework.serializers import Field, Serializer
+    while frame is not None:
+        field = frame.f_locals.get('self')
+        if isinstance(field, Field):
+            name = frame.f_code.co_name
+            if isinstance(field, Serializer) and name.startswith('get_'):
+                return f'{type(field).__name__}.{name}'
+            if field.parent is not None and field.field_name:
+                return f'{type(field.parent).__name__}.{field.field_name}'
+            return f'{type(field).__name__}.{name}'
+        frame = frame.f_back
+    return ''
+
+
+def trimmed_stack(frame):
+    """Последние кадры стека из кода проекта."""
+    root = str(settings.BASE_DIR)
+    lines = []
+    while frame is not None and len(lines) < settings.SLOW_QUERY_STACK_DEPTH:
+        file_name = frame.f_code.co_filename
+        if (
+            file_name.startswith(root)
+            and 'site-packages' not in file_name
+            and file_name != __file__
+        ):
+            lines.append(
+                f'{os.path.relpath(file_name, root)}:{frame.f_lineno} '
+                f'{frame.f_code.co_name}')
+        frame = frame.f_back
+    return '\n'.join(reversed(lines))
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        if duration >= settings.SLOW_QUERY_THRESHOLD and not saving.get():
+            if many:
+                params = params[0] if isinstance(
+                    params, (list, tuple)) and params else None
+            frame = sys._getframe(1)
+            view, action = current_view.get()
+            pending.append(SlowQuery(
+                duration=duration,
+                sql=sql,
+                params=redact_params(sql, params),
+                view=view,
+                action=action,
+                serializer_field=serializer_field(frame),
+                stack=trimmed_stack(frame),
+            ))
+
+
+def install_wrapper(connection, **kwargs):
+    """
+    Ставит обертку первой в списке: временные обертки
+    connection.execute_wrapper() снимаются с конца списка.
+    """
+    if slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, slow_query_wrapper)
+
+
+def save_slow_queries():
+    """Сохраняет накопленные записи и удаляет вышедшие за предел."""
+    entries = []
+    try:
+        while True:
+            entries.append(pending.popleft())
+    except IndexError:
+        pass
+    if not entries:
+        return
+    token = saving.set(True)
+    try:
+        SlowQuery.objects.bulk_create(entries)
+        size = settings.SLOW_QUERY_LOG_SIZE
+        boundary = list(SlowQuery.objects.order_by('-id').values_list(
+            'id', flat=True)[size:size + 1])
+        if boundary:
+            SlowQuery.objects.filter(id__lte=boundary[0]).delete()
+    finally:
+        saving.reset(token)
+
+
+def export_slow_queries(queryset):
+    """Записи журнала в виде списка словарей для выгрузки в JSON."""
+    return list(queryset.values(
+        'id', 'created_at', 'duration', 'sql', 'params', 'view', 'action',
+        'serializer_field', 'stack'))
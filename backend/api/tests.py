@@ -1,16 +1,77 @@
+import base64
+import datetime
+import decimal
+import gzip
+import io
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
 from http import HTTPStatus
+from unittest import mock
 
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
 from django.contrib.auth import get_user_model
-from django.test import TestCase
-from rest_framework.test import APIClient
+from django.db import DatabaseError
+from django.db.models import F, Q
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
 
+from api.authentication import TokenCache, token_cache
+from api.bulk_import import RecipeImporter
+from api.cache import (bump_catalogue_version, forget_catalogue_version,
+                       get_catalogue_version, get_recipe_cache)
+from api.feed import (HIGH_FANOUT_AUTHORS_KEY, rebuild_timeline,
+                      trim_timelines)
+from api.metrics import REQUESTS
+from api.pantry import ingredient_index
+from api.profiling import make_profile_token
+from api.projections import project_recipes
+from api.ranking import forget_epoch, get_epoch, refresh_rankings
+from api.renderers import ORJSONRenderer
+from api.similarity import build_similar_recipes, incidence_matrix
+from api.slow_queries import redact_params
+from api.serializers import RecipeReadSerializer
+from api.throttling import bucket_store, concurrency_limiter
 from reviews import models
+from reviews.deletion import (process_batch, schedule_recipe_deletion,
+                              schedule_user_deletion)
+from users.models import Subscription
 
 User = get_user_model()
 
+IMAGE = (
+    "data:image/png;base64,iVBORw0K"
+    "GgoAAAANSUhEUgAAAAEAAAABAgMAAAB"
+    "ieywaAAAACVBMVEUAAAD///9fX1/S0e"
+    "cCAAAACXBIWXMAAA7EAAAOxAGVKw4bA"
+    "AAACklEQVQImWNoAAAAggCByxOyYQAAA"
+    "ABJRU5ErkJggg=="
+)
+MEDIA_ROOT = tempfile.mkdtemp()
 
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
 class RecipeAPITestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
     def setUp(self):
+        get_recipe_cache().clear()
+        forget_catalogue_version()
+        forget_epoch()
+        token_cache.clear()
+        bucket_store.clear()
+        ingredient_index.clear()
         self.guest_client = APIClient()
         self.user = User.objects.create_user(
             username='testuser',
@@ -47,12 +108,7 @@ class RecipeAPITestCase(TestCase):
             "name": "Test",
             "text": "приготовление авокадо",
             "cooking_time": 20,
-            "image": "data:image/png;base64,iVBORw0K"
-                     "GgoAAAANSUhEUgAAAAEAAAABAgMAAAB"
-                     "ieywaAAAACVBMVEUAAAD///9fX1/S0e"
-                     "cCAAAACXBIWXMAAA7EAAAOxAGVKw4bA"
-                     "AAACklEQVQImWNoAAAAggCByxOyYQAAA"
-                     "ABJRU5ErkJggg==",
+            "image": IMAGE,
         }
         response = self.client.post(
             '/api/recipes/',
@@ -62,3 +118,1118 @@ class RecipeAPITestCase(TestCase):
         )
         self.assertEqual(response.status_code, HTTPStatus.CREATED)
         self.assertTrue(models.Recipe.objects.filter(name='Test').exists())
+
+    def test_recipe_update_keeps_untouched_rows(self):
+        """Проверка, что при обновлении рецепта не пересоздаются
+        неизменившиеся строки ингредиентов и тегов."""
+        breakfast = models.Tag.objects.create(name='Завтрак', slug='breakfast')
+        lunch = models.Tag.objects.create(name='Обед', slug='lunch')
+        dinner = models.Tag.objects.create(name='Ужин', slug='dinner')
+        avocado = models.Ingredient.objects.create(
+            name='Авокадо', measurement_unit='шт')
+        egg = models.Ingredient.objects.create(
+            name='Яйцо', measurement_unit='шт')
+        salt = models.Ingredient.objects.create(
+            name='Соль', measurement_unit='г')
+        bread = models.Ingredient.objects.create(
+            name='Хлеб', measurement_unit='г')
+        data = {
+            "ingredients": [
+                {"id": avocado.id, "amount": 1},
+                {"id": egg.id, "amount": 2},
+                {"id": salt.id, "amount": 5},
+            ],
+            "tags": [breakfast.id, lunch.id],
+            "name": "Тост",
+            "text": "приготовление тоста",
+            "cooking_time": 10,
+            "image": IMAGE,
+        }
+        response = self.client.post('/api/recipes/', data=data, format='json')
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        recipe = models.Recipe.objects.get(pk=response.data['id'])
+        ingredient_pks = dict(
+            recipe.ingredients_relations.values_list('ingredient_id', 'pk'))
+        tag_through = models.Recipe.tags.through.objects.filter(recipe=recipe)
+        tag_pks = dict(tag_through.values_list('tag_id', 'pk'))
+
+        data['ingredients'] = [
+            {"id": avocado.id, "amount": 1},
+            {"id": egg.id, "amount": 3},
+            {"id": bread.id, "amount": 50},
+        ]
+        data['tags'] = [breakfast.id, dinner.id]
+        response = self.client.patch(
+            f'/api/recipes/{recipe.id}/', data=data, format='json')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        relations = {
+            relation.ingredient_id: relation
+            for relation in recipe.ingredients_relations.all()
+        }
+        self.assertEqual(set(relations), {avocado.id, egg.id, bread.id})
+        self.assertEqual(relations[avocado.id].pk, ingredient_pks[avocado.id])
+        self.assertEqual(relations[egg.id].pk, ingredient_pks[egg.id])
+        self.assertEqual(relations[egg.id].amount, 3)
+        self.assertEqual(relations[bread.id].amount, 50)
+        new_tag_pks = dict(tag_through.values_list('tag_id', 'pk'))
+        self.assertEqual(set(new_tag_pks), {breakfast.id, dinner.id})
+        self.assertEqual(new_tag_pks[breakfast.id], tag_pks[breakfast.id])
+
+    def test_recipe_validation_reports_all_missing_ids(self):
+        """Проверка, что все несуществующие ингредиенты и теги
+        перечисляются в одной ошибке."""
+        tag = models.Tag.objects.create(name='Завтрак', slug='breakfast')
+        avocado = models.Ingredient.objects.create(
+            name='Авокадо', measurement_unit='шт')
+        data = {
+            "ingredients": [
+                {"id": avocado.id, "amount": 1},
+                {"id": 9001, "amount": 1},
+                {"id": 9002, "amount": 1},
+            ],
+            "tags": [tag.id, 777, 778],
+            "name": "Test",
+            "text": "приготовление авокадо",
+            "cooking_time": 20,
+            "image": IMAGE,
+        }
+        response = self.client.post('/api/recipes/', data=data, format='json')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('9001, 9002', str(response.data['ingredients']))
+        self.assertIn('777, 778', str(response.data['tags']))
+
+    def test_favorite_and_shopping_cart_toggles(self):
+        """Проверка добавления и удаления рецепта из избранного
+        и списка покупок, включая повторные запросы."""
+        recipe = models.Recipe.objects.create(
+            author=self.user,
+            name='Тост',
+            text='приготовление тоста',
+            cooking_time=10,
+            image='recipes/images/toast.png'
+        )
+        self.client.get('/api/users/me/')
+        get_epoch()
+        for url in (f'/api/recipes/{recipe.id}/favorite/',
+                    f'/api/recipes/{recipe.id}/shopping_cart/'):
+            with self.subTest(url=url):
+                with self.assertNumQueries(3):
+                    response = self.client.post(url)
+                self.assertEqual(response.status_code, HTTPStatus.CREATED)
+                self.assertEqual(
+                    set(response.data),
+                    {'id', 'name', 'image', 'cooking_time'}
+                )
+                with self.assertNumQueries(2):
+                    response = self.client.post(url)
+                self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+                response = self.client.delete(url)
+                self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+                response = self.client.delete(url)
+                self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.client.post('/api/recipes/9999/favorite/')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.delete('/api/recipes/9999/shopping_cart/')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        models.Recipe.objects.filter(pk=recipe.pk).update(is_hidden=True)
+        response = self.client.delete(
+            f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_subscribe_toggle(self):
+        """Проверка подписки и отписки от автора."""
+        author = User.objects.create_user(
+            username='author',
+            email='author@mail.ru',
+            password='testpass1232025'
+        )
+        url = f'/api/users/{author.id}/subscribe/'
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertTrue(response.data['is_subscribed'])
+        self.assertEqual(response.data['recipes_count'], 0)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.client.post(f'/api/users/{self.user.id}/subscribe/')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_bulk_shopping_cart(self):
+        """Проверка массового добавления и удаления рецептов
+        из списка покупок."""
+        recipes = [
+            models.Recipe.objects.create(
+                author=self.user,
+                name=f'Рецепт {number}',
+                text='описание',
+                cooking_time=10,
+                image='recipes/images/toast.png'
+            )
+            for number in range(3)
+        ]
+        models.ShoppingCart.objects.create(author=self.user, recipe=recipes[0])
+        ids = [recipe.id for recipe in recipes] + [9999]
+        response = self.client.post(
+            '/api/recipes/shopping_cart/bulk/',
+            data={'ids': ids},
+            format='json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            [item['result'] for item in response.data['results']],
+            ['exists', 'added', 'added', 'not_found']
+        )
+        self.assertEqual(self.user.shopping_carts.count(), 3)
+        response = self.client.delete(
+            '/api/recipes/shopping_cart/bulk/',
+            data={'ids': ids[1:]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            [item['result'] for item in response.data['results']],
+            ['removed', 'removed', 'absent']
+        )
+        self.assertEqual(self.user.shopping_carts.count(), 1)
+
+    def test_batch(self):
+        """Проверка выполнения нескольких запросов одним вызовом."""
+        models.Tag.objects.create(name='Завтрак', slug='breakfast')
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.post(
+            '/api/batch/',
+            data={'requests': [
+                {'method': 'GET', 'url': '/api/users/me/'},
+                {'method': 'GET', 'url': '/api/tags/'},
+                {'method': 'GET', 'url': '/api/recipes/?limit=2'},
+                {'method': 'GET', 'url': '/api/unknown/'},
+                {'method': 'GET', 'url': '/api/batch/'},
+                {'method': 'GET', 'url': '/api/recipes/export/'},
+            ]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        responses = response.data['responses']
+        self.assertEqual(
+            [item['status'] for item in responses],
+            [HTTPStatus.OK, HTTPStatus.OK, HTTPStatus.OK,
+             HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND,
+             HTTPStatus.BAD_REQUEST]
+        )
+        self.assertEqual(responses[0]['body']['email'], self.user.email)
+        self.assertEqual(responses[1]['body'][0]['slug'], 'breakfast')
+        self.assertEqual(responses[2]['body']['count'], 0)
+
+    def test_anonymous_list_cache(self):
+        """Проверка кэширования списка рецептов для анонимов
+        и его сброса при изменении каталога."""
+        url = '/api/recipes/?tags=lunch&tags=breakfast&limit=2'
+        response = self.guest_client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        response = self.guest_client.get(
+            '/api/recipes/?limit=2&tags=breakfast&tags=lunch')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Tag.objects.create(name='Обед', slug='lunch')
+        response = self.guest_client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        response = self.guest_client.get('/api/recipes/?is_favorited=1')
+        self.assertNotIn('X-Cache', response)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.guest_client.post('/api/auth/token/login/', {
+                'email': 'ooo@mail.ru', 'password': 'testpass1232025'})
+            self.user.set_password('newpass1232025')
+            self.user.save()
+        response = self.guest_client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        with self.settings(CATALOGUE_VERSION_TTL=0):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.first_name = 'Иван'
+                self.user.save()
+            response = self.guest_client.get(url)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            models.CatalogueVersion.objects.update(
+                version=F('version') + 1)
+            response = self.guest_client.get(url)
+            self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_shared_payload_with_viewer_overlay(self):
+        """Проверка, что пользователь получает общий закэшированный
+        ответ со своими значениями is_favorited и is_subscribed."""
+        author = User.objects.create_user(
+            username='author',
+            email='author@mail.ru',
+            password='testpass1232025'
+        )
+        recipe = models.Recipe.objects.create(
+            author=author,
+            name='Тост',
+            text='приготовление тоста',
+            cooking_time=10,
+            image='recipes/images/toast.png'
+        )
+        models.Favorite.objects.create(author=self.user, recipe=recipe)
+        self.client.post(f'/api/users/{author.id}/subscribe/')
+        response = self.guest_client.get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertFalse(response.json()['results'][0]['is_favorited'])
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        result = response.data['results'][0]
+        self.assertTrue(result['is_favorited'])
+        self.assertFalse(result['is_in_shopping_cart'])
+        self.assertTrue(result['author']['is_subscribed'])
+        response = self.client.get(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertTrue(response.data['is_favorited'])
+        response = self.guest_client.get(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertFalse(response.data['is_favorited'])
+        self.assertFalse(response.data['author']['is_subscribed'])
+
+    def test_orjson_renderer_matches_json_renderer(self):
+        """Проверка побайтового совпадения вывода ORJSONRenderer
+        со стандартным JSONRenderer."""
+        data = {
+            'name': 'Салат «Оливье»\u2028',
+            'amount': decimal.Decimal('1.5'),
+            'pub_date': datetime.datetime(
+                2025, 1, 1, 12, 30, 15, 123, tzinfo=datetime.timezone.utc),
+            'label': gettext_lazy('Название'),
+            1: [None, True, 2.5, ('a', 'b')],
+        }
+        self.assertEqual(
+            ORJSONRenderer().render(data),
+            JSONRenderer().render(data)
+        )
+        floats = {'floats': [1e16, 1.5e-7, 1e-5, -2.5e20]}
+        self.assertEqual(
+            ORJSONRenderer().render(floats),
+            b'{"floats":[1e16,1.5e-7,0.00001,-2.5e20]}'
+        )
+        self.assertEqual(
+            JSONRenderer().render(floats),
+            b'{"floats":[1e+16,1.5e-07,1e-05,-2.5e+20]}'
+        )
+        self.assertEqual(
+            json.loads(ORJSONRenderer().render(floats)), floats)
+        self.assertEqual(
+            ORJSONRenderer().render({'score': [math.nan, math.inf]}),
+            b'{"score":[null,null]}'
+        )
+        with self.assertRaises(ValueError):
+            JSONRenderer().render({'score': math.nan})
+
+    def test_projection_matches_serializer(self):
+        """Проверка, что values()-проекция рецептов совпадает
+        с выводом RecipeReadSerializer."""
+        tags = [
+            models.Tag.objects.create(name=name, slug=slug)
+            for name, slug in (('Ужин', 'dinner'), ('Завтрак', 'breakfast'))
+        ]
+        ingredients = [
+            models.Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(3)
+        ]
+        self.user.avatar = 'users/avatar.png'
+        self.user.save()
+        for number in range(3):
+            recipe = models.Recipe.objects.create(
+                author=self.user,
+                name=f'Рецепт {number}',
+                text='описание',
+                cooking_time=10 + number,
+                image=f'recipes/images/рецепт {number}.png'
+            )
+            recipe.tags.set(tags[number:])
+            models.IngredientRecipe.objects.bulk_create([
+                models.IngredientRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1)
+                for ingredient in reversed(ingredients[number:])
+            ])
+        recipes = models.Recipe.objects.all()
+        request = APIRequestFactory().get('/api/recipes/')
+        expected = RecipeReadSerializer(
+            recipes,
+            many=True,
+            context={'request': request, 'shared': True}
+        ).data
+        projected = project_recipes(
+            [recipe.id for recipe in recipes], request)
+        self.assertEqual(
+            JSONRenderer().render(projected),
+            JSONRenderer().render(expected)
+        )
+
+    def test_sparse_fieldsets(self):
+        """Проверка параметров fields= и omit= и пропуска запросов
+        для невыбранных полей."""
+        author = User.objects.create_user(
+            username='author',
+            email='author@mail.ru',
+            password='testpass1232025'
+        )
+        models.Recipe.objects.create(
+            author=author,
+            name='Тост',
+            text='приготовление тоста',
+            cooking_time=10,
+            image='recipes/images/toast.png'
+        )
+        get_catalogue_version()
+        with self.assertNumQueries(3):
+            response = self.guest_client.get(
+                '/api/recipes/?fields=name,image,cooking_time')
+        self.assertEqual(
+            list(response.json()['results'][0]),
+            ['id', 'name', 'image', 'cooking_time']
+        )
+        response = self.client.get('/api/recipes/?omit=author,ingredients')
+        self.assertNotIn('author', response.data['results'][0])
+        self.assertIn('is_favorited', response.data['results'][0])
+        self.client.post(f'/api/users/{author.id}/subscribe/')
+        response = self.client.get(
+            '/api/users/subscriptions/?omit=recipes,email')
+        self.assertEqual(
+            list(response.data['results'][0]),
+            ['id', 'username', 'first_name', 'last_name', 'is_subscribed',
+             'recipes_count', 'avatar']
+        )
+        self.assertEqual(response.data['results'][0]['recipes_count'], 1)
+        response = self.client.get('/api/users/me/?fields=username')
+        self.assertEqual(list(response.data), ['id', 'username'])
+
+    def test_compact_list(self):
+        """Проверка компактного ответа с авторами и тегами в included."""
+        tag = models.Tag.objects.create(name='Завтрак', slug='breakfast')
+        for number in range(3):
+            recipe = models.Recipe.objects.create(
+                author=self.user,
+                name=f'Рецепт {number}',
+                text='описание',
+                cooking_time=10,
+                image='recipes/images/toast.png'
+            )
+            recipe.tags.set([tag])
+        response = self.client.get(
+            f'/api/recipes/?compact=1&author={self.user.id}')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.data['count'], 3)
+        for recipe in response.data['results']:
+            self.assertNotIn('author', recipe)
+            self.assertEqual(recipe['author_id'], self.user.id)
+            self.assertEqual(recipe['tags'], [tag.id])
+        included = response.data['included']
+        self.assertEqual([author['id'] for author in included['authors']],
+                         [self.user.id])
+        self.assertFalse(included['authors'][0]['is_subscribed'])
+        self.assertEqual(included['tags'],
+                         [{'id': tag.id, 'name': tag.name, 'slug': tag.slug}])
+
+    def test_precompressed_responses(self):
+        """Проверка сжатия ответов и отдачи сжатых вариантов из кэша."""
+        for number in range(100):
+            models.Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+        response = self.guest_client.get(
+            '/api/ingredients/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))),
+                         100)
+        response = self.guest_client.get(
+            '/api/ingredients/', HTTP_ACCEPT_ENCODING='gzip;q=0.5, br')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        response = self.guest_client.get('/api/ingredients/')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(response.json()), 100)
+        with mock.patch('api.compression.compress') as precompress:
+            for cache_status in ('MISS', 'HIT'):
+                response = self.guest_client.get(
+                    '/api/ingredients/?name=Ингредиент',
+                    HTTP_ACCEPT_ENCODING='gzip')
+                self.assertEqual(response['X-Cache'], cache_status)
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+        precompress.assert_not_called()
+        self.assertEqual(
+            len(json.loads(gzip.decompress(response.content))), 100)
+        response = self.client.get(
+            '/api/users/me/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_cached_token_authentication(self):
+        """Проверка кэширования токена и его сброса при выходе
+        и деактивации пользователя."""
+        self.client.get('/api/users/me/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/users/me/?fields=username')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.user.is_active = True
+        self.user.save()
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        worker_a, worker_b = TokenCache(), TokenCache()
+        with self.settings(TOKEN_CACHE_ALIAS='default'):
+            worker_b.set('key', (self.user, None))
+            self.assertEqual(worker_b.get('key')[0], self.user)
+            worker_a.invalidate('key')
+            self.assertIsNone(worker_b.get('key'))
+
+    def test_throttling_and_load_shedding(self):
+        """Проверка ограничения дорогих запросов по стоимости
+        и по числу одновременно выполняемых запросов."""
+        with self.settings(REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {'download_shopping_cart': '25/min'},
+        }):
+            url = '/api/recipes/download_shopping_cart/'
+            for _ in range(2):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+            response = self.client.get(url)
+            self.assertEqual(
+                response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+            self.assertIn('Retry-After', response)
+            response = self.client.get('/api/recipes/?limit=600')
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+        limit = settings.CONCURRENCY_LIMITS['expensive']
+        for _ in range(limit):
+            concurrency_limiter.acquire('expensive', limit)
+        try:
+            response = self.client.get('/api/recipes/?limit=600')
+            self.assertEqual(
+                response.status_code, HTTPStatus.SERVICE_UNAVAILABLE)
+            self.assertIn('Retry-After', response)
+            response = self.client.get('/api/recipes/?limit=6')
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+        finally:
+            for _ in range(limit):
+                concurrency_limiter.release('expensive')
+
+    def test_subscription_feed(self):
+        """Проверка ленты подписок с раскладкой при записи,
+        подмешиванием при чтении и пагинацией по курсору."""
+        authors = [
+            User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@mail.ru',
+                password='testpass1232025'
+            )
+            for number in range(2)
+        ]
+        for author in authors:
+            self.client.post(f'/api/users/{author.id}/subscribe/')
+        recipes = []
+        with self.settings(FEED_FANOUT_MAX_FOLLOWERS=0):
+            with self.captureOnCommitCallbacks(execute=True):
+                recipes.append(models.Recipe.objects.create(
+                    author=authors[1],
+                    name='Суп',
+                    text='описание',
+                    cooking_time=10,
+                    image='recipes/images/soup.png'
+                ))
+        for number in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                recipes.append(models.Recipe.objects.create(
+                    author=authors[0],
+                    name=f'Рецепт {number}',
+                    text='описание',
+                    cooking_time=10,
+                    image='recipes/images/toast.png'
+                ))
+        self.assertEqual(
+            models.TimelineEntry.objects.filter(user=self.user).count(), 3)
+        response = self.client.get('/api/recipes/feed/?limit=3')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        ids = [recipe['id'] for recipe in response.data['results']]
+        response = self.client.get(response.data['next'])
+        ids += [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+        self.assertIsNone(response.data['next'])
+        with self.settings(FEED_MAX_LENGTH=2):
+            with self.captureOnCommitCallbacks(execute=True):
+                recipes.append(models.Recipe.objects.create(
+                    author=authors[0],
+                    name='Рецепт 3',
+                    text='описание',
+                    cooking_time=10,
+                    image='recipes/images/toast.png'
+                ))
+            with self.assertNumQueries(1):
+                trim_timelines([self.user.id, authors[1].id])
+        self.assertEqual(
+            list(models.TimelineEntry.objects.filter(
+                user=self.user).values_list('recipe_id', flat=True)),
+            [recipes[-1].id, recipes[-2].id]
+        )
+        get_recipe_cache().delete(HIGH_FANOUT_AUTHORS_KEY)
+        schedule_recipe_deletion(recipes[-1])
+        rebuild_timeline(self.user.id)
+        self.assertEqual(
+            list(models.TimelineEntry.objects.filter(
+                user=self.user).values_list('recipe_id', flat=True)),
+            [recipes[-2].id, recipes[-3].id, recipes[-4].id, recipes[0].id]
+        )
+        self.client.delete(f'/api/users/{authors[0].id}/subscribe/')
+        self.assertEqual(
+            list(models.TimelineEntry.objects.filter(
+                user=self.user).values_list('recipe_id', flat=True)),
+            [recipes[0].id]
+        )
+        self.client.delete(f'/api/users/{authors[1].id}/subscribe/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/users/{authors[0].id}/subscribe/')
+        self.assertEqual(
+            list(models.TimelineEntry.objects.filter(
+                user=self.user).values_list('recipe_id', flat=True)),
+            [recipes[-2].id, recipes[-3].id, recipes[-4].id]
+        )
+
+    def test_similar_recipes(self):
+        """Проверка полного и инкрементального пересчета похожих рецептов."""
+        ingredients = [
+            models.Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(4)
+        ]
+        recipes = []
+        for used in ((0, 1, 2), (0, 1, 2), (0, 1), (3,)):
+            recipe = models.Recipe.objects.create(
+                author=self.user,
+                name='Рецепт',
+                text='описание',
+                cooking_time=10,
+                image='recipes/images/soup.png'
+            )
+            models.IngredientRecipe.objects.bulk_create(
+                models.IngredientRecipe(
+                    recipe=recipe, ingredient=ingredients[number], amount=1)
+                for number in used
+            )
+            recipes.append(recipe)
+        run = build_similar_recipes()
+        self.assertTrue(run.full)
+        self.assertEqual(run.recipes_updated, 4)
+        response = self.guest_client.get(
+            f'/api/recipes/{recipes[0].id}/similar/?fields=id')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data],
+            [recipes[1].id, recipes[2].id]
+        )
+        response = self.guest_client.get(
+            f'/api/recipes/{recipes[3].id}/similar/')
+        self.assertEqual(response.data, [])
+        models.IngredientRecipe.objects.filter(recipe=recipes[3]).update(
+            ingredient=ingredients[0])
+        recipes[3].save()
+        run = build_similar_recipes()
+        self.assertFalse(run.full)
+        self.assertEqual(run.recipes_updated, 4)
+        self.assertEqual(
+            list(models.SimilarRecipe.objects.filter(
+                recipe=recipes[3]
+            ).values_list('similar_id', flat=True)),
+            [recipes[2].id, recipes[0].id, recipes[1].id]
+        )
+        self.assertIn(
+            recipes[3].id,
+            models.SimilarRecipe.objects.filter(
+                recipe=recipes[0]
+            ).values_list('similar_id', flat=True)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_recipe_deletion(recipes[2])
+        build_similar_recipes()
+        self.assertFalse(models.SimilarRecipe.objects.filter(
+            Q(recipe=recipes[2]) | Q(similar=recipes[2])).exists())
+        matrix = incidence_matrix(
+            np.array([2, 5]), [(2, 7), (3, 8), (5, 7), (9, 8)])
+        self.assertEqual(matrix.toarray().tolist(), [[1], [1]])
+
+    def test_what_can_i_cook(self):
+        """Проверка поиска рецептов по имеющимся ингредиентам."""
+        with self.assertNumQueries(0):
+            ingredient_index.update_recipes([1])
+        ingredients = [
+            models.Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(4)
+        ]
+        recipes = []
+        for used in ((0, 1), (0, 1, 2), (3,)):
+            recipe = models.Recipe.objects.create(
+                author=self.user,
+                name='Рецепт',
+                text='описание',
+                cooking_time=10,
+                image='recipes/images/soup.png'
+            )
+            models.IngredientRecipe.objects.bulk_create(
+                models.IngredientRecipe(
+                    recipe=recipe, ingredient=ingredients[number], amount=1)
+                for number in used
+            )
+            recipes.append(recipe)
+        url = (
+            '/api/recipes/what_can_i_cook/'
+            f'?ingredients={ingredients[0].id},{ingredients[1].id}'
+        )
+        response = self.guest_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            [(recipe['id'], recipe['matched_ingredients'],
+              recipe['total_ingredients']) for recipe in response.data],
+            [(recipes[0].id, 2, 2)]
+        )
+        response = self.guest_client.get(url + '&missing=1&fields=id')
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data],
+            [recipes[0].id, recipes[1].id]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            models.IngredientRecipe.objects.filter(
+                recipe=recipes[2]).update(ingredient=ingredients[0])
+            recipes[2].save()
+        response = self.guest_client.get(url + '&fields=id')
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data],
+            [recipes[0].id, recipes[2].id]
+        )
+        with mock.patch.object(ingredient_index, 'remove_recipes'):
+            with self.captureOnCommitCallbacks(execute=True):
+                recipes[0].delete()
+        response = self.guest_client.get(url + '&fields=id&limit=1')
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data], [recipes[2].id])
+        self.assertNotIn(recipes[0].id, ingredient_index.rows)
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_recipe_deletion(recipes[2])
+        response = self.guest_client.get(url + '&fields=id')
+        self.assertEqual(response.data, [])
+        response = self.guest_client.get(url + '&missing=x')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_popular_and_trending_ordering(self):
+        """Проверка сортировки по популярности и трендовости."""
+        recipes = [
+            models.Recipe.objects.create(
+                author=self.user,
+                name=f'Рецепт {number}',
+                text='описание',
+                cooking_time=10,
+                image='recipes/images/soup.png'
+            )
+            for number in range(3)
+        ]
+        self.client.post(f'/api/recipes/{recipes[0].id}/favorite/')
+        self.client.post(
+            '/api/recipes/shopping_cart/bulk/',
+            {'ids': [recipes[0].id, recipes[1].id]},
+            format='json'
+        )
+        models.Favorite.objects.create(
+            author=User.objects.create_user(
+                username='reader', email='reader@mail.ru', password='x'),
+            recipe=recipes[2],
+            created_at=timezone.now() - datetime.timedelta(days=20)
+        )
+
+        def ordered(ordering):
+            response = self.guest_client.get(
+                f'/api/recipes/?ordering={ordering}&fields=id')
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            return [recipe['id'] for recipe in response.json()['results']]
+
+        self.assertEqual(
+            ordered('popular'),
+            [recipes[0].id, recipes[1].id, recipes[2].id]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            run = refresh_rankings()
+        self.assertEqual(run.recipes_scored, 3)
+        self.assertEqual(
+            ordered('popular'),
+            [recipes[0].id, recipes[2].id, recipes[1].id]
+        )
+        self.assertEqual(
+            ordered('trending'),
+            [recipes[0].id, recipes[1].id, recipes[2].id]
+        )
+        response = self.guest_client.get('/api/recipes/?ordering=oldest')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        with mock.patch('django.utils.timezone.now', return_value=(
+            timezone.now() + datetime.timedelta(days=3 * 365)
+        )), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/api/recipes/{recipes[1].id}/favorite/')
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        recipes[1].refresh_from_db()
+        self.assertTrue(math.isfinite(recipes[1].trending))
+        self.assertEqual(
+            models.Recipe.objects.order_by('-trending').first(), recipes[1])
+        epoch = get_epoch()
+        started_at = epoch + datetime.timedelta(hours=1)
+        models.RankingRun.objects.create(
+            started_at=started_at, duration=0, recipes_scored=0)
+        bump_catalogue_version()
+        forget_catalogue_version()
+        self.assertEqual(get_epoch(), started_at)
+
+    def test_streaming_export(self):
+        """Проверка выгрузки рецептов в NDJSON с продолжением."""
+        tag = models.Tag.objects.create(name='Завтрак', slug='breakfast')
+        ingredient = models.Ingredient.objects.create(
+            name='Соль', measurement_unit='г')
+        recipes = []
+        for number in range(3):
+            recipe = models.Recipe.objects.create(
+                author=self.user,
+                name=f'Рецепт {number}',
+                text='описание',
+                cooking_time=10,
+                image='recipes/images/soup.png'
+            )
+            recipe.tags.add(tag)
+            models.IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=number + 1)
+            recipes.append(recipe)
+        response = self.client.get('/api/recipes/export/')
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(
+            f'/api/recipes/export/?after={recipes[0].id}')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        lines = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            [line['id'] for line in lines],
+            [recipes[1].id, recipes[2].id]
+        )
+        self.assertEqual(lines[0]['tags'], ['breakfast'])
+        self.assertEqual(lines[0]['ingredients'], [
+            {'name': 'Соль', 'measurement_unit': 'г', 'amount': 2}
+        ])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'recipes.ndjson')
+            call_command('export_recipes', path, stdout=io.StringIO())
+            with open(path, 'rb+') as file:
+                file.truncate(file.seek(0, os.SEEK_END) - 5)
+            call_command(
+                'export_recipes', path, '--resume', stdout=io.StringIO())
+            with open(path, 'rb') as file:
+                self.assertEqual(
+                    [json.loads(line)['id'] for line in file],
+                    [recipe.id for recipe in recipes]
+                )
+
+    def test_bulk_import(self):
+        """Проверка массового импорта рецептов с продолжением."""
+        tag = models.Tag.objects.create(name='Завтрак', slug='breakfast')
+        models.Ingredient.objects.create(name='Соль', measurement_unit='г')
+        line = {
+            'author': {'username': self.user.username},
+            'name': 'Рецепт',
+            'text': 'описание',
+            'cooking_time': 10,
+            'image': 'toast.png',
+            'pub_date': '2024-05-01T10:00:00+00:00',
+            'tags': [tag.slug],
+            'ingredients': [
+                {'name': 'Соль', 'measurement_unit': 'г', 'amount': 5}
+            ],
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'toast.png'), 'wb') as image:
+                image.write(base64.b64decode(IMAGE.split(',')[1]))
+            path = os.path.join(directory, 'recipes.ndjson')
+            invalid = (
+                {'pub_date': 'not-a-date'},
+                {'text': None},
+                {'name': 'x' * 257},
+                {'cooking_time': True},
+                {'tags': ['lunch']},
+            )
+            with open(path, 'w') as file:
+                for number in range(3):
+                    file.write(json.dumps({**line, 'name': f'Рецепт {number}'}))
+                    file.write('\n')
+                    file.write(json.dumps({**line, **invalid[number]}) + '\n')
+                for fields in invalid[3:]:
+                    file.write(json.dumps({**line, **fields}) + '\n')
+            stderr = io.StringIO()
+            call_command(
+                'import_recipes', path, '--images-dir', directory,
+                '--batch-size', '2', stdout=io.StringIO(), stderr=stderr
+            )
+            for message in (
+                "Строка 2: некорректная дата публикации 'not-a-date'",
+                'Строка 4: text должно быть непустой строкой',
+                'Строка 6: name длиннее 256 символов',
+                'Строка 7: cooking_time должно быть целым от 1 до 32000',
+                'Строка 8: неизвестные теги lunch',
+            ):
+                self.assertIn(message, stderr.getvalue())
+            call_command(
+                'import_recipes', path, '--resume', stdout=io.StringIO())
+            images = sorted(
+                os.listdir(os.path.join(MEDIA_ROOT, 'recipes/images')))
+            importer = RecipeImporter(directory)
+            with mock.patch.object(
+                importer, 'assign_short_codes', side_effect=DatabaseError
+            ), self.assertRaises(DatabaseError):
+                importer.import_lines([(1, json.dumps(line))])
+            importer.close()
+            self.assertEqual(
+                sorted(os.listdir(os.path.join(MEDIA_ROOT, 'recipes/images'))),
+                images)
+        recipes = models.Recipe.objects.order_by('id')
+        self.assertEqual(
+            [recipe.name for recipe in recipes],
+            ['Рецепт 0', 'Рецепт 1', 'Рецепт 2']
+        )
+        recipe = recipes[0]
+        self.assertTrue(recipe.short_code)
+        self.assertTrue(recipe.image.name.startswith('recipes/images/toast'))
+        self.assertEqual(recipe.pub_date.year, 2024)
+        self.assertEqual(list(recipe.tags.all()), [tag])
+        self.assertEqual(
+            list(recipe.ingredients_relations.values_list('amount', flat=True)),
+            [5]
+        )
+
+    def test_admin_search_and_widgets(self):
+        """Проверка поиска в админке и виджетов без полного списка."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@mail.ru', password='x')
+        author = User.objects.create_user(
+            username='chef', email='chef@mail.ru', password='x')
+        ingredient = models.Ingredient.objects.create(
+            name='Соль', measurement_unit='г')
+        models.Ingredient.objects.create(name='Сахар', measurement_unit='г')
+        recipes = [
+            models.Recipe.objects.create(
+                author=recipe_author,
+                name=name,
+                text='описание',
+                cooking_time=10,
+                image='recipes/images/soup.png'
+            )
+            for recipe_author, name in (
+                (self.user, 'Борщ'), (author, 'Суп'), (self.user, 'Каша'))
+        ]
+        models.IngredientRecipe.objects.create(
+            recipe=recipes[0], ingredient=ingredient, amount=1)
+        self.client.force_login(admin)
+        response = self.client.get('/admin/reviews/recipe/?q=Бор')
+        self.assertEqual(
+            list(response.context['cl'].result_list), [recipes[0]])
+        response = self.client.get('/admin/reviews/recipe/?q=che')
+        self.assertEqual(
+            list(response.context['cl'].result_list), [recipes[1]])
+        response = self.client.get(
+            f'/admin/reviews/recipe/{recipes[0].id}/change/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotContains(response, 'Сахар')
+
+    def test_background_deletion(self):
+        """Проверка скрытия и фонового удаления рецепта и пользователя."""
+        author = User.objects.create_user(
+            username='chef', email='chef@mail.ru', password='x')
+        ingredient = models.Ingredient.objects.create(
+            name='Соль', measurement_unit='г')
+        recipes = []
+        for recipe_author in (self.user, author, author):
+            recipe = models.Recipe.objects.create(
+                author=recipe_author,
+                name='Рецепт',
+                text='описание',
+                cooking_time=10,
+                image='recipes/images/soup.png'
+            )
+            models.IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1)
+            models.Favorite.objects.create(author=self.user, recipe=recipe)
+            recipes.append(recipe)
+        self.client.post(f'/api/users/{author.id}/subscribe/')
+        response = self.client.delete(f'/api/recipes/{recipes[0].id}/')
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        response = self.client.get(f'/api/recipes/{recipes[0].id}/')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        job = schedule_user_deletion(author)
+        self.assertFalse(
+            models.Recipe.objects.filter(is_hidden=False).exists())
+        process_batch(job, batch_size=1)
+        process_batch(job, batch_size=1)
+        self.assertEqual(job.rows_deleted, 2)
+        call_command(
+            'process_deletions', '--batch-size', '1', stdout=io.StringIO())
+        self.assertEqual(
+            set(models.DeletionJob.objects.values_list('status', flat=True)),
+            {models.DeletionJob.DONE}
+        )
+        self.assertFalse(models.Recipe.objects.exists())
+        self.assertFalse(models.IngredientRecipe.objects.exists())
+        self.assertFalse(models.Favorite.objects.exists())
+        self.assertFalse(Subscription.objects.exists())
+        self.assertFalse(User.objects.filter(pk=author.pk).exists())
+        job = models.DeletionJob.objects.create(
+            target=models.DeletionJob.RECIPE, object_id=recipes[0].id,
+            status=models.DeletionJob.FAILED, stage=3, error='IntegrityError')
+        self.client.force_login(User.objects.create_superuser(
+            username='admin', email='admin@mail.ru', password='x'))
+        self.client.post('/admin/reviews/deletionjob/', {
+            'action': 'retry', '_selected_action': [job.id]})
+        job.refresh_from_db()
+        self.assertEqual(
+            (job.status, job.stage, job.error),
+            (models.DeletionJob.PENDING, 0, ''))
+
+    def test_request_profiling(self):
+        """Проверка профилирования запросов сотрудником."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@mail.ru', password='x')
+        with tempfile.TemporaryDirectory() as directory, self.settings(
+            PROFILING_DIR=directory, PROFILING_MAX_FILES=2
+        ):
+            response = self.client.get('/api/recipes/')
+            self.assertNotIn('X-Profile-Id', response)
+            for token in (make_profile_token(self.user), 'poddelka'):
+                response = self.client.get(
+                    '/api/recipes/', HTTP_X_PROFILE_TOKEN=token)
+                self.assertNotIn('X-Profile-Id', response)
+            response = self.client.get('/api/recipes/?_profile=1')
+            self.assertNotIn('X-Profile-Id', response)
+            response = self.client.get(
+                '/api/users/',
+                HTTP_X_PROFILE_TOKEN=make_profile_token(admin))
+            profile = models.RequestProfile.objects.get(
+                pk=response['X-Profile-Id'])
+            self.assertEqual(profile.user, admin)
+            self.assertGreater(profile.queries, 0)
+            self.client.force_login(admin)
+            with self.captureOnCommitCallbacks(execute=True):
+                for _ in range(2):
+                    self.client.get('/api/tags/?_profile=1')
+            self.assertEqual(
+                set(os.listdir(directory)),
+                set(models.RequestProfile.objects.values_list(
+                    'file_name', flat=True))
+            )
+            self.assertFalse(models.RequestProfile.objects.filter(
+                pk=profile.pk).exists())
+            profile = models.RequestProfile.objects.first()
+            response = self.client.get(
+                f'/admin/reviews/requestprofile/{profile.pk}/change/')
+            self.assertContains(response, 'cumulative')
+            response = self.client.get(
+                f'/admin/reviews/requestprofile/{profile.pk}/download/')
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_metrics_endpoint(self):
+        """Проверка метрик и их суммирования по процессам."""
+        self.client.get('/api/recipes/')
+        self.client.get('/api/recipes/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        with self.settings(METRICS_ALLOWED_NETWORKS=['127.0.0.0/8']):
+            response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        content = response.content.decode()
+        self.assertIn(
+            'foodgram_http_requests_total{view="RecipeViewSet",'
+            'action="list",status="200"}', content)
+        self.assertIn(
+            'foodgram_http_request_duration_seconds_bucket{'
+            'view="RecipeViewSet",action="list",le="+Inf"}', content)
+        self.assertIn(
+            'foodgram_cache_requests_total{cache="recipes",result="hit"}',
+            content)
+        with tempfile.TemporaryDirectory() as directory, self.settings(
+            METRICS_DIR=directory, METRICS_TOKEN='secret'
+        ):
+            for file_name, value in (('1-1.json', 5), ('2-1.json', 3)):
+                with open(os.path.join(directory, file_name), 'wb') as file:
+                    file.write(json.dumps({
+                        REQUESTS.name: [[['WorkerView', 'list', '200'], value]],
+                    }).encode())
+            thread = threading.Thread(
+                target=REQUESTS.inc, args=(('WorkerView', 'list', '200'),))
+            thread.start()
+            thread.join()
+            response = self.guest_client.get('/metrics')
+            self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+            with mock.patch(
+                'api.metrics.process_alive', side_effect=lambda pid: pid != 2
+            ):
+                for _ in range(2):
+                    response = self.guest_client.get(
+                        '/metrics', HTTP_AUTHORIZATION='Bearer secret')
+                    self.assertIn(
+                        'foodgram_http_requests_total{view="WorkerView",'
+                        'action="list",status="200"} 9.0',
+                        response.content.decode())
+            self.assertNotIn(thread.ident, REQUESTS._shards)
+            self.assertFalse(
+                os.path.exists(os.path.join(directory, '2-1.json')))
+
+    def test_slow_query_log(self):
+        """Проверка журнала медленных запросов и скрытия секретов."""
+        self.assertEqual(
+            redact_params(
+                'UPDATE "users_extendeduser" SET "password" = %s, '
+                '"username" = %s WHERE "id" IN (%s, %s)',
+                ['pbkdf2_sha256$1$x', 'chef', 1, 2]),
+            ['***', 'chef', 1, 2]
+        )
+        self.assertEqual(
+            redact_params(
+                'INSERT INTO "authtoken_token" ("key", "user_id") '
+                'VALUES (%s, %s)', ['a' * 40, 1]),
+            ['***', 1]
+        )
+        User.objects.create_user(
+            username='chef', email='chef@mail.ru', password='x')
+        with self.settings(SLOW_QUERY_THRESHOLD=0, SLOW_QUERY_LOG_SIZE=4):
+            self.client.get('/api/users/')
+        entries = models.SlowQuery.objects.all()
+        self.assertEqual(len(entries), 4)
+        entry = entries.filter(
+            serializer_field='ExtendedUserSerializer.get_is_subscribed'
+        ).first()
+        self.assertEqual(
+            (entry.view, entry.action), ('ExtendedUserViewSet', 'list'))
+        self.assertIn('get_is_subscribed', entry.stack)
+        output = io.StringIO()
+        call_command(
+            'export_slow_queries', '--view', 'ExtendedUserViewSet',
+            stdout=output)
+        self.assertEqual(
+            len(json.loads(output.getvalue())),
+            entries.filter(view='ExtendedUserViewSet').count()
+        )
+        self.client.force_login(User.objects.create_superuser(
+            username='admin', email='admin@mail.ru', password='x'))
+        response = self.client.get(
+            f'/admin/reviews/slowquery/{entry.pk}/change/')
+        self.assertContains(response, 'get_is_subscribed')
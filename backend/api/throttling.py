@@ -0,0 +1,196 @@
+"""
+Ограничение частоты и параллельности дорогих запросов:
+token bucket с учетом стоимости запроса и лимит одновременно
+выполняемых дорогих запросов.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .constants import EXPENSIVE_REQUEST_COST, PAGE_SIZE
+
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """Разбирает строку вида '600/min' в (емкость, токенов в секунду)."""
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / DURATIONS[period[0]]
+
+
+class BucketStore:
+    """
+    Хранилище состояний token bucket: в памяти процесса
+    или, при заданном THROTTLE_CACHE_ALIAS, в общем кэше.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, capacity, rate):
+        """
+        Списывает cost токенов. Возвращает 0, если запрос разрешен,
+        иначе время в секундах до накопления нужного числа токенов.
+        """
+        cost = min(cost, capacity)
+        alias = settings.THROTTLE_CACHE_ALIAS
+        with self._lock:
+            now = time.time()
+            if alias:
+                state = caches[alias].get(key)
+            else:
+                state = self._buckets.get(key)
+            tokens, updated = state or (capacity, now)
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate
+            if alias:
+                caches[alias].set(
+                    key, (tokens, now), math.ceil(capacity / rate))
+            else:
+                self._buckets[key] = (tokens, now)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+bucket_store = BucketStore()
+
+
+class CostBasedThrottle(BaseThrottle):
+    """
+    Token bucket на пару (пользователь или IP, эндпоинт).
+    Емкость и скорость пополнения задаются в DEFAULT_THROTTLE_RATES
+    по имени действия или, по умолчанию, по ключу 'api'; запрос
+    списывает столько токенов, сколько вернет view.get_request_cost().
+    """
+    default_scope = 'api'
+
+    def allow_request(self, request, view):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        action = getattr(view, 'action', None)
+        scope = action if action in rates else self.default_scope
+        if rates.get(scope) is None:
+            return True
+        capacity, rate = parse_rate(rates[scope])
+        if request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        cost = 1
+        if hasattr(view, 'get_request_cost'):
+            cost = view.get_request_cost(request)
+        self._wait = bucket_store.take(
+            f'throttle:{scope}:{ident}', cost, capacity, rate)
+        return not self._wait
+
+    def wait(self):
+        return self._wait
+
+
+class ServiceBusy(APIException):
+    status_code = 503
+    default_detail = 'Сервер перегружен, повторите запрос позже.'
+    default_code = 'service_busy'
+
+    def __init__(self, wait, detail=None, code=None):
+        self.wait = wait
+        super().__init__(detail, code)
+
+
+class ConcurrencyLimiter:
+    """
+    Счетчик одновременно выполняемых запросов группы.
+    При заданном THROTTLE_CACHE_ALIAS счетчик общий для всех
+    процессов; ключ имеет время жизни, чтобы слоты, не освобожденные
+    упавшим процессом, со временем вернулись.
+    """
+    slot_timeout = 60
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, group, limit):
+        alias = settings.THROTTLE_CACHE_ALIAS
+        if alias:
+            cache = caches[alias]
+            key = f'concurrency:{group}'
+            cache.add(key, 0, self.slot_timeout)
+            if cache.incr(key) > limit:
+                cache.decr(key)
+                return False
+            return True
+        with self._lock:
+            if self._counts.get(group, 0) >= limit:
+                return False
+            self._counts[group] = self._counts.get(group, 0) + 1
+            return True
+
+    def release(self, group):
+        alias = settings.THROTTLE_CACHE_ALIAS
+        if alias:
+            try:
+                caches[alias].decr(f'concurrency:{group}')
+            except ValueError:
+                pass
+            return
+        with self._lock:
+            self._counts[group] -= 1
+
+
+concurrency_limiter = ConcurrencyLimiter()
+
+
+class LoadSheddingMixin:
+    """
+    Оценивает стоимость запроса для CostBasedThrottle и ограничивает
+    число одновременно выполняемых дорогих запросов согласно
+    CONCURRENCY_LIMITS, быстро отвечая 503 с Retry-After.
+    """
+    action_costs = {}
+
+    def get_request_cost(self, request):
+        cost = 1
+        limit = request.query_params.get('limit', '')
+        if limit.isdigit():
+            cost = max(1, math.ceil(int(limit) / PAGE_SIZE))
+        return cost + self.action_costs.get(self.action, 0)
+
+    def get_concurrency_group(self, request):
+        if self.action in settings.CONCURRENCY_LIMITS:
+            return self.action
+        if self.get_request_cost(request) >= EXPENSIVE_REQUEST_COST:
+            return 'expensive'
+        return None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        group = self.get_concurrency_group(request)
+        limit = settings.CONCURRENCY_LIMITS.get(group)
+        if limit is None:
+            return
+        if not concurrency_limiter.acquire(group, limit):
+            raise ServiceBusy(wait=settings.CONCURRENCY_RETRY_AFTER)
+        self._concurrency_group = group
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        group = getattr(self, '_concurrency_group', None)
+        if group is not None:
+            concurrency_limiter.release(group)
+            self._concurrency_group = None
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -1,8 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (ExtendedUserViewSet, IngredientViewSet, RecipeViewSet,
-                    TagViewSet)
+from .views import (BatchView, ExtendedUserViewSet, IngredientViewSet,
+                    RecipeViewSet, TagViewSet)
 
 app_name = 'api'
 
@@ -16,4 +16,5 @@ router.register('users', ExtendedUserViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('batch/', BatchView.as_view(), name='batch'),
 ]
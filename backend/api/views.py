@@ -1,41 +1,124 @@
+import hmac
+import io
+import ipaddress
+import json
+import math
+from urllib.parse import urlsplit
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.constants import OnConflict
+from django.db.models.signals import post_save
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
+from django.urls import Resolver404, resolve, reverse
+from django.views import View
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 
+from .cache import (catalogue_cache_key, get_cached_page,
+                    recipe_detail_cache_key, recipe_list_cache_key,
+                    set_cached_page)
+from .compression import precompressed_response
+from .constants import (DOWNLOAD_SHOPPING_CART_COST, PAGE_SIZE,
+                        PANTRY_MAX_RESULTS, PANTRY_OVERFETCH,
+                        SUBSCRIPTIONS_UNLIMITED_RECIPES_COST)
+from .export import export_recipes
+from .feed import read_feed
+from .fieldsets import requested_fields, split_param
 from .filters import IngredientFilter, RecipeFilter
+from .metrics import registry
+from .overlay import apply_viewer_overlay
 from .pagination import CustomLimitPagination
+from .pantry import ingredient_index
 from .permissions import AuthorOrReadOnly
-from .serializers import (ExtendedUserAvatarSerializer, ExtendedUserSerializer,
-                          FavoriteSerializer, IngredientSerializer,
+from .projections import (RECIPE_OUTPUT_FIELDS, project_recipes,
+                          sideload_recipes)
+from .ranking import record_additions
+from .serializers import (BatchSerializer, ExtendedUserAvatarSerializer,
+                          ExtendedUserSerializer,
+                          FavoriteShoppingCartSerializer,
+                          IngredientSerializer, RecipeIdsSerializer,
                           RecipeReadSerializer, RecipeSerializer,
-                          ShoppingCartSerializer, SubscribeSerializer,
                           SubscriptionsSerializer, TagSerializer)
+from .throttling import LoadSheddingMixin
+from reviews.deletion import schedule_recipe_deletion, schedule_user_deletion
 from reviews.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, Tag)
+                            ShoppingCart, SimilarRecipe, Tag, TimelineEntry)
 from users.models import Subscription
 
 User = get_user_model()
 
 
-class ExtendedUserViewSet(DjoserUserViewSet):
+def insert_ignoring_conflicts(model, **values):
+    """
+    Вставляет строку одним запросом без точки сохранения, пропуская
+    нарушение уникальности. Возвращает True, если строка вставлена;
+    тогда отправляет post_save с объектом без pk.
+    """
+    instance = model(**values)
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key
+    ]
+    ops = connection.ops
+    sql = '{} {} ({}) VALUES ({}) {}'.format(
+        ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        ops.quote_name(model._meta.db_table),
+        ', '.join(ops.quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+        ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [
+            field.get_db_prep_save(field.pre_save(instance, True), connection)
+            for field in fields
+        ])
+        inserted = cursor.rowcount == 1
+    if inserted:
+        post_save.send(
+            sender=model, instance=instance, created=True,
+            update_fields=None, raw=False, using=connection.alias)
+    return inserted
+
+
+class ExtendedUserViewSet(LoadSheddingMixin, DjoserUserViewSet):
     """
     Обрабатывает операции для модели ExtendedUser
     с помощью djoser.
     """
-    queryset = User.objects.all()
+    queryset = User.objects.filter(is_active=True)
     serializer_class = ExtendedUserSerializer
     lookup_field = 'id'
     paginator = CustomLimitPagination()
 
+    def perform_destroy(self, instance):
+        """
+        Скрывает пользователя и его рецепты; связанные записи
+        удаляются в фоне командой process_deletions.
+        """
+        schedule_user_deletion(instance)
+
+    def get_request_cost(self, request):
+        cost = super().get_request_cost(request)
+        if self.action != 'subscriptions':
+            return cost
+        recipes_limit = request.query_params.get('recipes_limit', '')
+        if not recipes_limit.isdigit():
+            return cost * SUBSCRIPTIONS_UNLIMITED_RECIPES_COST
+        return cost * max(1, math.ceil(int(recipes_limit) / PAGE_SIZE))
+
     @action(
         methods=['get'],
         detail=False,
@@ -101,11 +184,24 @@ class ExtendedUserViewSet(DjoserUserViewSet):
         """
         user = request.user
         subscriptions = Subscription.objects.filter(
-            user=user).select_related('author')
-        authors = [sub.author for sub in subscriptions]
+            user=user).select_related('author').order_by('id')
+        fields = requested_fields(request, SubscriptionsSerializer.Meta.fields)
+        if 'recipes_count' in fields:
+            subscriptions = subscriptions.annotate(
+                recipes_count=Count(
+                    'author__recipes',
+                    filter=Q(author__recipes__is_hidden=False)
+                ))
         paginator = self.pagination_class()
-        page = paginator.paginate_queryset(authors, request)
-        serializer = SubscriptionsSerializer(page, many=True, context={
+        page = paginator.paginate_queryset(subscriptions, request)
+        authors = []
+        for subscription in page:
+            author = subscription.author
+            author.is_subscribed = True
+            if 'recipes_count' in fields:
+                author.recipes_count = subscription.recipes_count
+            authors.append(author)
+        serializer = SubscriptionsSerializer(authors, many=True, context={
             'request': request
         })
         return paginator.get_paginated_response(serializer.data)
@@ -122,17 +218,30 @@ class ExtendedUserViewSet(DjoserUserViewSet):
         Обрабатывает post запросы модели Subscription.
         """
         user = request.user
-        author = get_object_or_404(User, pk=id)
-        data = {
-            'user': user.id,
-            'author': author.id
-        }
-        serializer = SubscribeSerializer(
-            data=data,
+        author = get_object_or_404(
+            User.objects.filter(is_active=True).annotate(
+                recipes_count=Count(
+                    'recipes', filter=Q(recipes__is_hidden=False))
+            ),
+            pk=id
+        )
+        if user.pk == author.pk:
+            return Response(
+                {'detail': 'Вы не можете подписаться на себя!'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not insert_ignoring_conflicts(
+            Subscription, user=user, author=author
+        ):
+            return Response(
+                {'detail': 'Вы уже подписаны на этого пользователя!'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        author.is_subscribed = True
+        serializer = SubscriptionsSerializer(
+            author,
             context={'request': request}
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
         return Response(
             serializer.data,
             status=status.HTTP_201_CREATED
@@ -143,40 +252,49 @@ class ExtendedUserViewSet(DjoserUserViewSet):
         """
         Обрабатывает delete запросы модели Subscription.
         """
-        user = request.user
-        author = get_object_or_404(User, pk=id)
         delete_cnt, _ = Subscription.objects.filter(
-            user=user,
-            author=author
+            user=request.user,
+            author_id=id
         ).delete()
         if not delete_cnt:
+            get_object_or_404(User, pk=id)
             return Response(
                 {'detail': 'Вы не подписаны на этого пользователя.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        TimelineEntry.objects.filter(
+            user=request.user,
+            recipe__author_id=id
+        ).delete()
         return Response(
             {'detail': 'Подписка удалена.'},
             status=status.HTTP_204_NO_CONTENT
         )
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(LoadSheddingMixin, viewsets.ModelViewSet):
     """
     Обрабатывает операции CRUD для модели Recipe.
     """
-    queryset = Recipe.objects.prefetch_related(
+    queryset = Recipe.objects.filter(
+        is_hidden=False
+    ).select_related('author').prefetch_related(
         'tags',
-        'ingredients_relations__ingredient',
-        'favorites',
-        'favorites__author',
-        'shopping_carts',
-        'shopping_carts__author'
+        'ingredients_relations__ingredient'
     )
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     pagination_class = CustomLimitPagination
     filterset_class = RecipeFilter
     lookup_field = 'id'
+    action_costs = {'download_shopping_cart': DOWNLOAD_SHOPPING_CART_COST}
+
+    def perform_destroy(self, instance):
+        """
+        Скрывает рецепт; связанные записи удаляются в фоне
+        командой process_deletions.
+        """
+        schedule_recipe_deletion(instance)
 
     def get_permissions(self):
         if self.action in ['update', 'destroy', 'partial_update']:
@@ -190,57 +308,373 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeSerializer
         return super().get_serializer_class()
 
-    @action(
-        detail=True,
-        methods=['post'],
-        url_path='favorite',
-        url_name='favorite',
-        permission_classes=[IsAuthenticated]
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ['list', 'retrieve']:
+            context['shared'] = True
+        return context
 
-    )
-    def favorite(self, request, id=None):
+    def get_shared_page(self, request, fields, key):
         """
-        Обрабатывает операцию по добавлению рецепта в избранное.
+        Возвращает общую для всех пользователей страницу рецептов
+        и признак попадания в кэш.
         """
-        author = request.user
-        recipe = get_object_or_404(Recipe, pk=id)
+        data = get_cached_page(key) if key else None
+        if data is not None:
+            return data, 'HIT'
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(
+            queryset.prefetch_related(None).values_list('id', flat=True)
+        )
+        data = self.get_paginated_response(
+            project_recipes(page, request, fields)
+        ).data
+        if key:
+            set_cached_page(key, data)
+        return data, 'MISS'
+
+    def finalize_page(self, request, data, compact):
         data = {
-            'author': author.id,
-            'recipe': recipe.id
+            **data,
+            'results': apply_viewer_overlay(data['results'], request.user)
         }
-        serializer = FavoriteSerializer(
-            data=data,
+        if compact:
+            data['results'], data['included'] = sideload_recipes(
+                data['results'])
+        return data
+
+    def list(self, request, *args, **kwargs):
+        """
+        Отдает общий для всех пользователей список рецептов
+        (из кэша, если возможно) с наложенными полями текущего
+        пользователя. С параметром compact=1 авторы и теги
+        выносятся в раздел included. Анонимным пользователям
+        страница отдается из кэша уже отрендеренной и сжатой.
+        """
+        fields = requested_fields(request, RECIPE_OUTPUT_FIELDS)
+        key = recipe_list_cache_key(request, fields)
+        compact = request.query_params.get('compact') in ('1', 'true')
+        if (key and not request.user.is_authenticated
+                and request.accepted_renderer.format == 'json'):
+            return precompressed_response(
+                request,
+                f'{key}:{"compact" if compact else "full"}',
+                lambda: self.finalize_page(
+                    request,
+                    self.get_shared_page(request, fields, key)[0],
+                    compact
+                )
+            )
+        data, cache_status = self.get_shared_page(request, fields, key)
+        data = self.finalize_page(request, data, compact)
+        if not key:
+            return Response(data)
+        return Response(data, headers={'X-Cache': cache_status})
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Отдает общий для всех пользователей рецепт
+        (из кэша, если возможно) с наложенными полями текущего
+        пользователя.
+        """
+        fields = requested_fields(request, RECIPE_OUTPUT_FIELDS)
+        key = recipe_detail_cache_key(
+            request, kwargs[self.lookup_field], fields)
+        data = get_cached_page(key)
+        cache_status = 'HIT'
+        if data is None:
+            try:
+                recipe_id = int(kwargs[self.lookup_field])
+            except ValueError:
+                raise Http404
+            recipes = project_recipes([recipe_id], request, fields)
+            if not recipes:
+                raise Http404
+            data = recipes[0]
+            set_cached_page(key, data)
+            cache_status = 'MISS'
+        data, = apply_viewer_overlay([data], request.user)
+        return Response(data, headers={'X-Cache': cache_status})
+
+    def _add_to_list(self, request, model, id, message):
+        """
+        Добавляет рецепт в избранное или список покупок
+        одним запросом на вставку; повторное добавление
+        отсекается ограничением уникальности.
+        """
+        recipe = get_object_or_404(
+            Recipe.objects.filter(is_hidden=False).only(
+                'id', 'name', 'image', 'cooking_time'),
+            pk=id
+        )
+        if not insert_ignoring_conflicts(
+            model, author=request.user, recipe=recipe
+        ):
+            return Response(
+                {'detail': message},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        record_additions(model, [recipe.id])
+        serializer = FavoriteShoppingCartSerializer(
+            recipe,
             context={'request': request}
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
         return Response(
             serializer.data,
             status=status.HTTP_201_CREATED
         )
 
-    @favorite.mapping.delete
-    def delete_favorite(self, request, id=None):
+    def _bulk_change_list(self, request, model, add):
         """
-        Обрабатывает операцию по удалению рецепта
-        из избранного.
+        Добавляет в избранное или список покупок (или удаляет из них)
+        сразу несколько рецептов в одной транзакции.
         """
-        author = request.user
-        recipe = get_object_or_404(Recipe, pk=id)
-        delete_cnt, _ = Favorite.objects.filter(
-            recipe=recipe,
-            author=author
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        with transaction.atomic():
+            relations = model.objects.filter(
+                author=request.user,
+                recipe_id__in=ids
+            )
+            in_list = set(relations.values_list('recipe_id', flat=True))
+            existing = set()
+            if add:
+                existing = set(Recipe.objects.filter(
+                    pk__in=ids, is_hidden=False
+                ).values_list('id', flat=True))
+                added = [
+                    recipe_id for recipe_id in ids
+                    if recipe_id in existing and recipe_id not in in_list
+                ]
+                model.objects.bulk_create(
+                    [
+                        model(author=request.user, recipe_id=recipe_id)
+                        for recipe_id in added
+                    ],
+                    ignore_conflicts=True
+                )
+                record_additions(model, added)
+            elif in_list:
+                relations.delete()
+        results = []
+        for recipe_id in ids:
+            if add and recipe_id not in existing:
+                result = 'not_found'
+            elif add:
+                result = 'exists' if recipe_id in in_list else 'added'
+            else:
+                result = 'removed' if recipe_id in in_list else 'absent'
+            results.append({'id': recipe_id, 'result': result})
+        return Response({'results': results})
+
+    def _remove_from_list(self, request, model, id, error_message,
+                          success_message):
+        """
+        Удаляет рецепт из избранного или списка покупок
+        одним запросом на удаление.
+        """
+        delete_cnt, _ = model.objects.filter(
+            recipe_id=id,
+            author=request.user
         ).delete()
         if not delete_cnt:
+            get_object_or_404(Recipe.objects.filter(is_hidden=False), pk=id)
             return Response(
-                {'detail': 'Рецепт отсутствует в избранном.'},
+                {'detail': error_message},
                 status=status.HTTP_400_BAD_REQUEST
             )
         return Response(
-            {'detail': 'Рецепт удален из избранного.'},
+            {'detail': success_message},
             status=status.HTTP_204_NO_CONTENT
         )
 
+    @action(
+        detail=True,
+        methods=['post'],
+        url_path='favorite',
+        url_name='favorite',
+        permission_classes=[IsAuthenticated]
+
+    )
+    def favorite(self, request, id=None):
+        """
+        Обрабатывает операцию по добавлению рецепта в избранное.
+        """
+        return self._add_to_list(
+            request,
+            Favorite,
+            id,
+            'Этот рецепт уже добавлен в избранное!'
+        )
+
+    @favorite.mapping.delete
+    def delete_favorite(self, request, id=None):
+        """
+        Обрабатывает операцию по удалению рецепта
+        из избранного.
+        """
+        return self._remove_from_list(
+            request,
+            Favorite,
+            id,
+            'Рецепт отсутствует в избранном.',
+            'Рецепт удален из избранного.'
+        )
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='favorite/bulk',
+        url_name='favorite-bulk',
+        permission_classes=[IsAuthenticated]
+    )
+    def favorite_bulk(self, request):
+        """
+        Обрабатывает операцию по добавлению
+        нескольких рецептов в избранное.
+        """
+        return self._bulk_change_list(request, Favorite, add=True)
+
+    @favorite_bulk.mapping.delete
+    def delete_favorite_bulk(self, request):
+        """
+        Обрабатывает операцию по удалению
+        нескольких рецептов из избранного.
+        """
+        return self._bulk_change_list(request, Favorite, add=False)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='feed',
+        url_name='feed',
+        permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        """
+        Обрабатывает операцию получения ленты рецептов авторов,
+        на которых подписан пользователь. Пагинация по курсору.
+        """
+        limit = request.query_params.get('limit', '')
+        limit = int(limit) if limit.isdigit() else settings.FEED_PAGE_SIZE
+        recipe_ids, next_cursor = read_feed(
+            request.user,
+            max(1, min(limit, settings.FEED_MAX_LENGTH)),
+            request.query_params.get('cursor')
+        )
+        fields = requested_fields(request, RECIPE_OUTPUT_FIELDS)
+        results = apply_viewer_overlay(
+            project_recipes(recipe_ids, request, fields),
+            request.user
+        )
+        next_url = None
+        if next_cursor:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'cursor', next_cursor)
+        return Response({'next': next_url, 'results': results})
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='export',
+        url_name='export',
+        permission_classes=[permissions.IsAdminUser]
+    )
+    def export(self, request):
+        """
+        Обрабатывает операцию потоковой выгрузки всех рецептов в NDJSON.
+        Выгрузку можно продолжить с рецепта после after=<id>.
+        """
+        after = request.query_params.get('after', '0')
+        if not after.isdigit():
+            raise ValidationError('Параметр after должен быть целым числом.')
+        response = StreamingHttpResponse(
+            export_recipes(int(after)),
+            content_type='application/x-ndjson'
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="recipes.ndjson"')
+        return response
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='what_can_i_cook',
+        url_name='what_can_i_cook',
+        permission_classes=[IsAuthenticatedOrReadOnly]
+    )
+    def what_can_i_cook(self, request):
+        """
+        Обрабатывает операцию поиска рецептов по имеющимся
+        ингредиентам (ingredients=1,2,3). Рецепту может не хватать
+        не более missing ингредиентов.
+        """
+        ingredient_ids = split_param(request, 'ingredients')
+        missing = request.query_params.get('missing', '0')
+        limit = request.query_params.get('limit', str(PAGE_SIZE))
+        if not all(
+            value.isdigit() for value in (*ingredient_ids, missing, limit)
+        ):
+            raise ValidationError(
+                'Параметры ingredients, missing и limit '
+                'должны быть целыми числами.'
+            )
+        limit = min(int(limit), PANTRY_MAX_RESULTS)
+        # Удаленные в другом процессе рецепты отсеиваются проекцией,
+        # поэтому кандидаты берутся с запасом, а затем обрезаются.
+        matches = ingredient_index.match(
+            map(int, ingredient_ids),
+            int(missing),
+            limit * PANTRY_OVERFETCH
+        )
+        fields = requested_fields(request, RECIPE_OUTPUT_FIELDS)
+        recipes = project_recipes(
+            [recipe_id for recipe_id, *_ in matches], request, fields)
+        found = {recipe['id'] for recipe in recipes}
+        stale = [
+            recipe_id for recipe_id, *_ in matches if recipe_id not in found
+        ]
+        if stale:
+            ingredient_index.remove_recipes(stale)
+        recipes = apply_viewer_overlay(recipes[:limit], request.user)
+        coverage = {
+            recipe_id: (matched, total)
+            for recipe_id, matched, total in matches
+        }
+        for recipe in recipes:
+            recipe['matched_ingredients'], recipe['total_ingredients'] = (
+                coverage[recipe['id']])
+        return Response(recipes)
+
+    @action(
+        detail=True,
+        methods=['get'],
+        url_path='similar',
+        url_name='similar',
+        permission_classes=[IsAuthenticatedOrReadOnly]
+    )
+    def similar(self, request, id=None):
+        """
+        Обрабатывает операцию получения похожих рецептов,
+        заранее рассчитанных командой build_similar_recipes.
+        """
+        recipe = get_object_or_404(
+            Recipe.objects.filter(is_hidden=False).only('id'), pk=id)
+        limit = request.query_params.get('limit', '')
+        limit = (
+            int(limit) if limit.isdigit()
+            else settings.SIMILAR_RECIPES_TOP_K
+        )
+        recipe_ids = list(SimilarRecipe.objects.filter(
+            recipe=recipe
+        ).values_list('similar_id', flat=True)[:limit])
+        fields = requested_fields(request, RECIPE_OUTPUT_FIELDS)
+        return Response(apply_viewer_overlay(
+            project_recipes(recipe_ids, request, fields),
+            request.user
+        ))
+
     @action(detail=True,
             methods=['get'],
             url_path='get-link',
@@ -250,7 +684,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """
         Обрабатывает операцию по получению короткой ссылки на рецепт.
         """
-        recipe = get_object_or_404(Recipe, pk=id)
+        recipe = get_object_or_404(
+            Recipe.objects.filter(is_hidden=False), pk=id)
         return Response({
             "short-link": request.build_absolute_uri(f"/s/{recipe.short_code}")
         })
@@ -268,7 +703,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         сформированный из рецептов, добавленных
         в список покупок.
         """
-        shopping_cart = request.user.shopping_carts.all()
+        shopping_cart = request.user.shopping_carts.filter(
+            recipe__is_hidden=False)
         recipe_ids = shopping_cart.values_list('recipe_id', flat=True)
         ingredients = IngredientRecipe.objects.filter(
             recipe_id__in=recipe_ids
@@ -304,21 +740,11 @@ class RecipeViewSet(viewsets.ModelViewSet):
         Обрабатывает операцию по добавлению рецепта
         в список покупок.
         """
-        author = request.user
-        recipe = get_object_or_404(Recipe, pk=id)
-        data = {
-            'author': author.id,
-            'recipe': recipe.id
-        }
-        serializer = ShoppingCartSerializer(
-            data=data,
-            context={'request': request}
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(
-            serializer.data,
-            status=status.HTTP_201_CREATED
+        return self._add_to_list(
+            request,
+            ShoppingCart,
+            id,
+            'Этот рецепт уже добавлен в список покупок!'
         )
 
     @shopping_cart.mapping.delete
@@ -327,22 +753,36 @@ class RecipeViewSet(viewsets.ModelViewSet):
         Обрабатывает операцию по удалению рецепта
         из списка покупок.
         """
-        author = request.user
-        recipe = get_object_or_404(Recipe, pk=id)
-        delete_cnt, _ = ShoppingCart.objects.filter(
-            recipe=recipe,
-            author=author
-        ).delete()
-        if not delete_cnt:
-            return Response(
-                {'detail': 'Рецепт отсутствует в списке покупок.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        return Response(
-            {'detail': 'Рецепт успешно удален из списка покупок.'},
-            status=status.HTTP_204_NO_CONTENT
+        return self._remove_from_list(
+            request,
+            ShoppingCart,
+            id,
+            'Рецепт отсутствует в списке покупок.',
+            'Рецепт успешно удален из списка покупок.'
         )
 
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='shopping_cart/bulk',
+        url_name='shopping_cart-bulk',
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_bulk(self, request):
+        """
+        Обрабатывает операцию по добавлению
+        нескольких рецептов в список покупок.
+        """
+        return self._bulk_change_list(request, ShoppingCart, add=True)
+
+    @shopping_cart_bulk.mapping.delete
+    def delete_shopping_cart_bulk(self, request):
+        """
+        Обрабатывает операцию по удалению
+        нескольких рецептов из списка покупок.
+        """
+        return self._bulk_change_list(request, ShoppingCart, add=False)
+
 
 class ShortLinkRedirectView(APIView):
     """
@@ -350,10 +790,41 @@ class ShortLinkRedirectView(APIView):
     по полученной короткой ссылки на рецепт.
     """
     def get(self, request, short_code):
-        recipe = get_object_or_404(Recipe, short_code=short_code)
+        recipe = get_object_or_404(
+            Recipe.objects.filter(is_hidden=False), short_code=short_code)
         return redirect(f'/recipes/{recipe.pk}/')
 
 
+class MetricsView(View):
+    """
+    Отдает метрики всех процессов в формате экспозиции Prometheus.
+    Если задан METRICS_TOKEN, требует заголовок
+    Authorization: Bearer <METRICS_TOKEN>, иначе отвечает только
+    адресам из METRICS_ALLOWED_NETWORKS (по умолчанию никому).
+    """
+    def allowed(self, request):
+        token = settings.METRICS_TOKEN
+        if token:
+            return hmac.compare_digest(
+                request.headers.get('Authorization', ''), f'Bearer {token}')
+        try:
+            address = ipaddress.ip_address(request.META.get('REMOTE_ADDR'))
+        except ValueError:
+            return False
+        return any(
+            address in ipaddress.ip_network(network)
+            for network in settings.METRICS_ALLOWED_NETWORKS
+        )
+
+    def get(self, request):
+        if not self.allowed(request):
+            return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+        return HttpResponse(
+            registry.expose(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
+
+
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     """
     Обрабатывает операции получения
@@ -364,6 +835,16 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        return precompressed_response(
+            request,
+            catalogue_cache_key('ingredients', request),
+            lambda: super(IngredientViewSet, self).list(
+                request, *args, **kwargs).data
+        )
+
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     """ Обрабатывает операции получения
@@ -372,3 +853,94 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     lookup_field = 'id'
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        return precompressed_response(
+            request,
+            catalogue_cache_key('tags', request),
+            lambda: super(TagViewSet, self).list(
+                request, *args, **kwargs).data
+        )
+
+
+class BatchView(APIView):
+    """
+    Выполняет несколько запросов к API в рамках одного HTTP-запроса.
+    Пользователь аутентифицируется один раз, повторные GET-запросы
+    к одному адресу отдаются из кэша текущего пакета.
+    """
+    permission_classes = (permissions.AllowAny,)
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cache = {}
+        responses = []
+        for item in serializer.validated_data['requests']:
+            method = item['method']
+            url = item['url']
+            if method != 'GET':
+                cache.clear()
+                responses.append(self._dispatch(request, item))
+            elif url not in cache:
+                cache[url] = self._dispatch(request, item)
+                responses.append(cache[url])
+            else:
+                responses.append(cache[url])
+        return Response({'responses': responses})
+
+    def _build_request(self, request, item):
+        url = urlsplit(item['url'])
+        body = b''
+        if 'body' in item:
+            body = json.dumps(item['body']).encode()
+        environ = {
+            key: value for key, value in request.META.items()
+            if key not in (
+                'CONTENT_TYPE', 'CONTENT_LENGTH', 'HTTP_ACCEPT_ENCODING'
+            )
+        }
+        environ.update({
+            'REQUEST_METHOD': item['method'],
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'HTTP_ACCEPT': 'application/json',
+            'wsgi.input': io.BytesIO(body),
+        })
+        sub_request = WSGIRequest(environ)
+        if request.user.is_authenticated:
+            sub_request._force_auth_user = request.user
+            sub_request._force_auth_token = request.auth
+        return sub_request
+
+    def _dispatch(self, request, item):
+        sub_request = self._build_request(request, item)
+        try:
+            match = resolve(sub_request.path_info)
+        except Resolver404:
+            match = None
+        if match is None or sub_request.path_info == reverse('api:batch'):
+            return {
+                'status': status.HTTP_404_NOT_FOUND,
+                'body': {'detail': 'Страница не найдена.'}
+            }
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        if response.streaming:
+            response.close()
+            return {
+                'status': status.HTTP_400_BAD_REQUEST,
+                'body': {
+                    'detail': 'Потоковые ответы недоступны в пакете запросов.'
+                }
+            }
+        if hasattr(response, 'render'):
+            response.render()
+        if response.get('Content-Type', '').startswith('application/json'):
+            body = json.loads(response.content) if response.content else None
+        else:
+            body = response.content.decode(response.charset)
+        return {'status': response.status_code, 'body': body}
@@ -51,12 +51,16 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.SlowQueryMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -101,6 +105,113 @@ if 'test' in sys.argv:
             'NAME': ':memory:',
         }
     }
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+RECIPE_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'recipes',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('RECIPE_CACHE_DIR', BASE_DIR / 'cache'),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'recipes': RECIPE_CACHE_BACKENDS[
+        os.getenv('RECIPE_CACHE_BACKEND', 'locmem')
+    ],
+}
+
+RECIPE_CACHE_ALIAS = 'recipes'
+
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', 300))
+
+CATALOGUE_VERSION_TTL = 1
+
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+
+PRECOMPRESS_FILTERED_MIN_SIZE = 16384
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 1024))
+
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 30))
+
+TOKEN_CACHE_LOCAL_TTL = int(os.getenv('TOKEN_CACHE_LOCAL_TTL', 5))
+
+TOKEN_CACHE_ALIAS = os.getenv('TOKEN_CACHE_ALIAS')
+
+THROTTLE_CACHE_ALIAS = os.getenv('THROTTLE_CACHE_ALIAS')
+
+CONCURRENCY_LIMITS = {
+    'download_shopping_cart': 2,
+    'expensive': 4,
+}
+
+CONCURRENCY_RETRY_AFTER = 1
+
+FEED_MAX_LENGTH = 500
+
+FEED_PAGE_SIZE = 10
+
+FEED_FANOUT_MAX_FOLLOWERS = 5000
+
+FEED_HIGH_FANOUT_TIMEOUT = 300
+
+SIMILAR_RECIPES_TOP_K = 10
+
+SIMILAR_RECIPES_CHUNK_SIZE = 500
+
+SIMILAR_RECIPES_TAG_WEIGHT = 0.2
+
+PANTRY_INDEX_REFRESH_OVERLAP = 60
+
+EXPORT_CHUNK_SIZE = 1000
+
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 10000
+
+PROFILING_DIR = os.getenv('PROFILING_DIR', BASE_DIR / 'profiles')
+
+PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', 50))
+
+PROFILING_TOKEN_MAX_AGE = 3600
+
+METRICS_DIR = os.getenv('METRICS_DIR')
+
+METRICS_FLUSH_INTERVAL = 5
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+METRICS_ALLOWED_NETWORKS = [
+    network for network in os.getenv('METRICS_ALLOWED_NETWORKS', '').split(',')
+    if network
+]
+
+SLOW_QUERY_THRESHOLD = float(os.getenv('SLOW_QUERY_THRESHOLD', 0.2))
+
+SLOW_QUERY_LOG_SIZE = 1000
+
+SLOW_QUERY_STACK_DEPTH = 8
+
+SLOW_QUERY_REDACT_PATTERN = 'password|token|key|secret|session'
+
+RANKING_WEIGHTS = {
+    'favorite': 1.0,
+    'shoppingcart': 0.5,
+}
+
+RANKING_EPOCH_TTL = 60
+
+RANKING_SCORES = {
+    'popularity': {'half_life': 30 * 86400, 'window': 180 * 86400},
+    'trending': {'half_life': 86400, 'window': 7 * 86400},
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -156,7 +267,28 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.CostBasedThrottle',
+    ],
+
+    'DEFAULT_THROTTLE_RATES': {
+        'api': os.getenv('THROTTLE_RATE_API', '600/min'),
+        'download_shopping_cart': '60/min',
+        'subscriptions': '300/min',
+    },
+
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 
@@ -3,7 +3,7 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
-from api.views import ShortLinkRedirectView
+from api.views import MetricsView, ShortLinkRedirectView
 
 
 urlpatterns = [
@@ -12,6 +12,7 @@ urlpatterns = [
          name='short-link-redirect'),
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
 
 if settings.DEBUG:
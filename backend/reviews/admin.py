@@ -1,7 +1,22 @@
 from django.contrib import admin
-from django.db.models import Count
+from django.contrib.auth import get_user_model
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
 
-from .models import Ingredient, IngredientRecipe, Recipe, Tag
+from api.profiling import profile_path, profile_summary
+from api.slow_queries import export_slow_queries
+
+from .deletion import schedule_recipe_deletion
+from .models import (DeletionJob, Favorite, Ingredient, IngredientRecipe,
+                     RankingRun, Recipe, RequestProfile, SimilarityRun,
+                     SlowQuery, Tag)
+from .paginator import EstimatedCountPaginator
+
+User = get_user_model()
 
 
 class IngredientRecipeInline(admin.StackedInline):
@@ -10,9 +25,38 @@ class IngredientRecipeInline(admin.StackedInline):
     min_num = 1
     validate_min = True
     fields = ('ingredient', 'amount')
+    autocomplete_fields = ('ingredient',)
+
+
+class BackgroundDeletionMixin:
+    """
+    Удаление из админки через фоновую задачу: страница подтверждения
+    не собирает связанные объекты, а объекты только скрываются.
+    """
+
+    def schedule_deletion(self, obj):
+        raise NotImplementedError
+
+    def get_deleted_objects(self, objs, request):
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.model._meta.verbose_name)
+        return (
+            [str(obj) for obj in objs],
+            {self.model._meta.verbose_name_plural: len(objs)},
+            perms_needed,
+            []
+        )
 
+    def delete_model(self, request, obj):
+        self.schedule_deletion(obj)
 
-class RecipeAdmin(admin.ModelAdmin):
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.schedule_deletion(obj)
+
+
+class RecipeAdmin(BackgroundDeletionMixin, admin.ModelAdmin):
     inlines = (
         IngredientRecipeInline,
     )
@@ -22,6 +66,9 @@ class RecipeAdmin(admin.ModelAdmin):
         'favorites_count'
     )
     list_select_related = ('author',)
+    autocomplete_fields = ('author', 'tags')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def get_author_username(self, obj):
         return obj.author.username
@@ -30,15 +77,41 @@ class RecipeAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
         queryset = queryset.annotate(
-            _favorites_count=Count('favorites'))
+            _favorites_count=Coalesce(Subquery(
+                Favorite.objects.filter(
+                    recipe=OuterRef('pk')
+                ).order_by().values('recipe').annotate(
+                    count=Count('id')
+                ).values('count')
+            ), 0))
         return queryset
 
     def favorites_count(self, obj):
         return obj._favorites_count
     favorites_count.short_description = 'В избранном'
 
-    search_fields = ('name', 'author__username')
-    list_filter = ('tags',)
+    search_fields = ('name__startswith',)
+    search_help_text = 'Начало названия рецепта или никнейм автора'
+    list_filter = ('tags', 'is_hidden')
+
+    def schedule_deletion(self, obj):
+        schedule_recipe_deletion(obj)
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Ищет по началу названия (индекс по name) или по началу
+        никнейма автора: id авторов находятся отдельным запросом
+        по индексу username, без JOIN и LIKE по всей таблице.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        author_ids = User.objects.filter(
+            username__startswith=search_term
+        ).values('id')
+        return queryset.filter(
+            Q(name__startswith=search_term) | Q(author_id__in=author_ids)
+        ), False
 
 
 class IngredientAdmin(admin.ModelAdmin):
@@ -46,10 +119,173 @@ class IngredientAdmin(admin.ModelAdmin):
         'name',
         'measurement_unit'
     )
-    search_fields = ('^name',)
+    search_fields = ('name__startswith',)
     ordering = ('name',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class TagAdmin(admin.ModelAdmin):
+    list_display = (
+        'name',
+        'slug'
+    )
+    search_fields = ('name', 'slug')
+
+
+class SimilarityRunAdmin(admin.ModelAdmin):
+    list_display = (
+        'started_at',
+        'full',
+        'recipes_total',
+        'recipes_updated',
+        'duration'
+    )
+
+
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'target',
+        'object_id',
+        'status',
+        'stage',
+        'rows_deleted',
+        'created_at',
+        'updated_at'
+    )
+    list_filter = ('status', 'target')
+    readonly_fields = ('error',)
+    actions = ('retry',)
+
+    @admin.action(description='Повторить удаление')
+    def retry(self, request, queryset):
+        # Пока задача стояла, в пройденные этапы могли добавиться строки,
+        # ссылающиеся на объект, поэтому удаление начинается заново.
+        queryset.filter(status=DeletionJob.FAILED).update(
+            status=DeletionJob.PENDING, stage=0, error='')
+
+
+class RankingRunAdmin(admin.ModelAdmin):
+    list_display = (
+        'started_at',
+        'recipes_scored',
+        'duration'
+    )
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        'created_at',
+        'method',
+        'path',
+        'status',
+        'duration',
+        'queries',
+        'user',
+        'download'
+    )
+    list_filter = ('method', 'status')
+    search_fields = ('path__startswith',)
+    fields = (
+        'created_at',
+        'user',
+        'method',
+        'path',
+        'status',
+        'duration',
+        'queries',
+        'download',
+        'summary'
+    )
+    readonly_fields = fields
+    list_select_related = ('user',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name='reviews_requestprofile_download'
+            ),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        if not self.has_view_permission(request):
+            raise Http404
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        try:
+            file = open(profile_path(profile.file_name), 'rb')
+        except FileNotFoundError:
+            raise Http404('Файл профиля не найден')
+        return FileResponse(
+            file, as_attachment=True, filename=profile.file_name)
+
+    def download(self, obj):
+        return format_html('<a href="{}">{}</a>', reverse(
+            'admin:reviews_requestprofile_download', args=(obj.pk,)
+        ), obj.file_name)
+    download.short_description = 'Файл профиля'
+
+    def summary(self, obj):
+        return format_html('<pre>{}</pre>', profile_summary(obj.file_name))
+    summary.short_description = 'Сводка по накопленному времени'
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = (
+        'created_at',
+        'duration',
+        'view',
+        'action',
+        'serializer_field',
+        'short_sql'
+    )
+    list_filter = ('view', 'action')
+    search_fields = ('sql', 'serializer_field')
+    fields = (
+        'created_at',
+        'duration',
+        'view',
+        'action',
+        'serializer_field',
+        'sql',
+        'params',
+        'stack'
+    )
+    readonly_fields = fields
+    actions = ('export_json',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def short_sql(self, obj):
+        return obj.sql[:100]
+    short_sql.short_description = 'SQL'
+
+    @admin.action(description='Выгрузить в JSON')
+    def export_json(self, request, queryset):
+        response = JsonResponse(
+            export_slow_queries(queryset), safe=False,
+            json_dumps_params={'ensure_ascii': False})
+        response['Content-Disposition'] = (
+            'attachment; filename="slow_queries.json"')
+        return response
 
 
 admin.site.register(Ingredient, IngredientAdmin)
-admin.site.register(Tag)
+admin.site.register(Tag, TagAdmin)
 admin.site.register(Recipe, RecipeAdmin)
+admin.site.register(SimilarityRun, SimilarityRunAdmin)
+admin.site.register(RankingRun, RankingRunAdmin)
+admin.site.register(DeletionJob, DeletionJobAdmin)
+admin.site.register(RequestProfile, RequestProfileAdmin)
+admin.site.register(SlowQuery, SlowQueryAdmin)
@@ -0,0 +1,113 @@
+"""
+Фоновое удаление рецептов и пользователей.
+Объект сразу скрывается, а связанные строки удаляются пачками
+по этапам прямыми DELETE без загрузки объектов в память.
+Последний этап удаляет сам объект через ORM: к этому моменту
+связанных строк почти не остается, а сигналы удаления срабатывают.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (DeletionJob, Favorite, IngredientRecipe, Recipe,
+                     ShoppingCart, SimilarRecipe, TimelineEntry)
+from users.models import Subscription
+
+User = get_user_model()
+
+
+def schedule_recipe_deletion(recipe):
+    with transaction.atomic():
+        recipe.is_hidden = True
+        recipe.save(update_fields=['is_hidden', 'updated_at'])
+        return DeletionJob.objects.create(
+            target=DeletionJob.RECIPE, object_id=recipe.pk)
+
+
+def schedule_user_deletion(user):
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        Recipe.objects.filter(author=user).update(
+            is_hidden=True, updated_at=timezone.now())
+        return DeletionJob.objects.create(
+            target=DeletionJob.USER, object_id=user.pk)
+
+
+def recipe_stages(recipes):
+    return (
+        IngredientRecipe.objects.filter(recipe__in=recipes),
+        Recipe.tags.through.objects.filter(recipe__in=recipes),
+        Favorite.objects.filter(recipe__in=recipes),
+        ShoppingCart.objects.filter(recipe__in=recipes),
+        TimelineEntry.objects.filter(recipe__in=recipes),
+        SimilarRecipe.objects.filter(recipe__in=recipes),
+        SimilarRecipe.objects.filter(similar__in=recipes),
+    )
+
+
+def job_stages(job):
+    """Возвращает querysets этапов удаления по порядку."""
+    if job.target == DeletionJob.RECIPE:
+        return recipe_stages([job.object_id]) + (
+            Recipe.objects.filter(pk=job.object_id),
+        )
+    user_id = job.object_id
+    return recipe_stages(
+        Recipe.objects.filter(author_id=user_id).values('id')
+    ) + (
+        Favorite.objects.filter(author_id=user_id),
+        ShoppingCart.objects.filter(author_id=user_id),
+        TimelineEntry.objects.filter(user_id=user_id),
+        Subscription.objects.filter(user_id=user_id),
+        Subscription.objects.filter(author_id=user_id),
+        Recipe.objects.filter(author_id=user_id),
+        User.objects.filter(pk=user_id),
+    )
+
+
+def process_batch(job, batch_size):
+    """Удаляет одну пачку строк текущего этапа и сохраняет прогресс."""
+    stages = job_stages(job)
+    queryset = stages[job.stage]
+    if job.stage == len(stages) - 1:
+        deleted, _ = queryset.delete()
+        job.status = DeletionJob.DONE
+    else:
+        pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+        deleted = 0
+        if pks:
+            deleted = queryset.model.objects.filter(
+                pk__in=pks)._raw_delete(queryset.db)
+        if len(pks) < batch_size:
+            job.stage += 1
+    job.rows_deleted += deleted
+    job.save(update_fields=['status', 'stage', 'rows_deleted', 'updated_at'])
+
+
+def process_job(job_id, batch_size):
+    """
+    Выполняет задачу пачками, каждая в своей транзакции.
+    Задачу, уже захваченную другим процессом, пропускает.
+    При ошибке помечает задачу как FAILED и возвращает текст ошибки.
+    """
+    while True:
+        try:
+            with transaction.atomic():
+                job = DeletionJob.objects.select_for_update(
+                    skip_locked=True
+                ).filter(pk=job_id, status=DeletionJob.PENDING).first()
+                if job is None:
+                    return None
+                process_batch(job, batch_size)
+        except Exception as error:
+            DeletionJob.objects.filter(pk=job_id).update(
+                status=DeletionJob.FAILED, error=repr(error))
+            return repr(error)
+
+
+def pending_jobs():
+    """Ожидающие задачи, включая прерванные сбоем."""
+    return list(DeletionJob.objects.filter(
+        status=DeletionJob.PENDING
+    ).order_by('id').values_list('id', flat=True))
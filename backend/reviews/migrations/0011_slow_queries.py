@@ -0,0 +1,32 @@
+# Generated by Django 5.0 on 2026-10-19 09:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0010_request_profiles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Выполнен')),
+                ('duration', models.FloatField(verbose_name='Длительность, с')),
+                ('sql', models.TextField(verbose_name='SQL')),
+                ('params', models.JSONField(default=list, verbose_name='Параметры')),
+                ('view', models.CharField(blank=True, max_length=128, verbose_name='Представление')),
+                ('action', models.CharField(blank=True, max_length=64, verbose_name='Действие')),
+                ('serializer_field', models.CharField(blank=True, max_length=128, verbose_name='Поле сериализатора')),
+                ('stack', models.TextField(blank=True, verbose_name='Стек вызовов')),
+            ],
+            options={
+                'verbose_name': 'медленный SQL-запрос',
+                'verbose_name_plural': 'Медленные SQL-запросы',
+                'ordering': ('-id',),
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0 on 2026-10-19 10:02
+
+import time
+
+from django.db import migrations, models
+
+
+def create_version(apps, schema_editor):
+    apps.get_model('reviews', 'CatalogueVersion').objects.create(
+        pk=1, version=time.time_ns())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0011_slow_queries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogueVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=1, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'версия каталога',
+                'verbose_name_plural': 'Версии каталога',
+            },
+        ),
+        migrations.RunPython(create_version, migrations.RunPython.noop),
+    ]
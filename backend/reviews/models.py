@@ -18,7 +18,8 @@ User = get_user_model()
 class Ingredient(models.Model):
     name = models.CharField(
         verbose_name='Название',
-        max_length=LIMIT_LENGTH_INGREDIENT_NAME
+        max_length=LIMIT_LENGTH_INGREDIENT_NAME,
+        db_index=True
     )
     measurement_unit = models.CharField(
         verbose_name='Еденица измерения',
@@ -77,7 +78,8 @@ class Recipe(models.Model):
     )
     name = models.CharField(
         verbose_name='Название рецепта',
-        max_length=LIMIT_LENGTH_RECIPE_NAME
+        max_length=LIMIT_LENGTH_RECIPE_NAME,
+        db_index=True
     )
     text = models.TextField(
         verbose_name='Описание рецепта',
@@ -109,6 +111,24 @@ class Recipe(models.Model):
         null=True,
         verbose_name='Короткий код'
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+        db_index=True
+    )
+    popularity = models.FloatField(
+        verbose_name='Популярность',
+        default=0
+    )
+    trending = models.FloatField(
+        verbose_name='Тренд',
+        default=0
+    )
+    is_hidden = models.BooleanField(
+        verbose_name='Скрыт (ожидает удаления)',
+        default=False,
+        db_index=True
+    )
 
     def generate_short_code(self):
         base = str(self.pk).zfill(6)
@@ -128,8 +148,28 @@ class Recipe(models.Model):
                 self.short_code = f"R{self.pk:06d}"[:LIMIT_LENGTH_SHORT_CODE]
             kwargs['force_insert'] = False
             super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=['-popularity', '-pub_date'],
+                name='recipe_popularity_idx'
+            ),
+            models.Index(
+                fields=['-trending', '-pub_date'],
+                name='recipe_trending_idx'
+            ),
+            models.Index(
+                fields=['author', '-popularity', '-pub_date'],
+                name='recipe_author_popularity_idx'
+            ),
+            models.Index(
+                fields=['author', '-trending', '-pub_date'],
+                name='recipe_author_trending_idx'
+            ),
+        ]
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
@@ -181,6 +221,11 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт',
         related_name='favorites')
+    created_at = models.DateTimeField(
+        verbose_name='Дата добавления',
+        default=timezone.now,
+        db_index=True
+    )
 
     class Meta:
         constraints = [
@@ -208,6 +253,11 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт',
         related_name='shopping_carts')
+    created_at = models.DateTimeField(
+        verbose_name='Дата добавления',
+        default=timezone.now,
+        db_index=True
+    )
 
     class Meta:
         constraints = [
@@ -222,3 +272,319 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.author} {self.recipe}'
+
+
+class TimelineEntry(models.Model):
+    """
+    Запись ленты подписок: рецепт автора, на которого
+    подписан пользователь. Заполняется при публикации рецепта.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='timeline_entries')
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='timeline_entries')
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации рецепта'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_timeline_user_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='timeline_user_pub_date_idx'
+            )
+        ]
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        ordering = ('-pub_date', '-recipe')
+
+    def __str__(self):
+        return f'{self.user} {self.recipe}'
+
+
+class SimilarRecipe(models.Model):
+    """
+    Предвычисленный похожий рецепт: строится командой
+    build_similar_recipes по пересечению ингредиентов и тегов.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='similar_recipes')
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Похожий рецепт',
+        related_name='+')
+    score = models.FloatField(
+        verbose_name='Сходство'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_similar_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'],
+                name='similar_recipe_score_idx'
+            )
+        ]
+        verbose_name = 'похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        ordering = ('recipe', '-score')
+
+    def __str__(self):
+        return f'{self.recipe} {self.similar}'
+
+
+class SimilarityRun(models.Model):
+    """Запуск пересчета похожих рецептов."""
+    started_at = models.DateTimeField(
+        verbose_name='Начало'
+    )
+    duration = models.FloatField(
+        verbose_name='Длительность, с'
+    )
+    full = models.BooleanField(
+        verbose_name='Полный пересчет'
+    )
+    recipes_total = models.PositiveIntegerField(
+        verbose_name='Рецептов в каталоге'
+    )
+    recipes_updated = models.PositiveIntegerField(
+        verbose_name='Пересчитано рецептов'
+    )
+
+    class Meta:
+        verbose_name = 'пересчет похожих рецептов'
+        verbose_name_plural = 'Пересчеты похожих рецептов'
+        ordering = ('-started_at',)
+
+    def __str__(self):
+        return f'{self.started_at} {self.recipes_updated}/{self.recipes_total}'
+
+
+class RankingRun(models.Model):
+    """
+    Пересчет популярности и трендовости рецептов.
+    Время начала последнего пересчета служит точкой отсчета
+    для затухающих весов добавлений в избранное и список покупок.
+    """
+    started_at = models.DateTimeField(
+        verbose_name='Начало'
+    )
+    duration = models.FloatField(
+        verbose_name='Длительность, с'
+    )
+    recipes_scored = models.PositiveIntegerField(
+        verbose_name='Рецептов с ненулевым рейтингом'
+    )
+
+    class Meta:
+        verbose_name = 'пересчет рейтингов рецептов'
+        verbose_name_plural = 'Пересчеты рейтингов рецептов'
+        ordering = ('-started_at',)
+
+    def __str__(self):
+        return f'{self.started_at} {self.recipes_scored}'
+
+
+class DeletionJob(models.Model):
+    """
+    Фоновое удаление рецепта или пользователя со всеми связанными
+    записями. Объект скрывается сразу, а строки удаляются пачками
+    командой process_deletions; stage — номер текущего этапа,
+    что позволяет продолжить удаление после сбоя.
+    """
+    RECIPE = 'recipe'
+    USER = 'user'
+    TARGETS = (
+        (RECIPE, 'Рецепт'),
+        (USER, 'Пользователь'),
+    )
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ожидает'),
+        (DONE, 'Завершено'),
+        (FAILED, 'Ошибка'),
+    )
+    target = models.CharField(
+        verbose_name='Тип объекта',
+        max_length=16,
+        choices=TARGETS
+    )
+    object_id = models.PositiveBigIntegerField(
+        verbose_name='id объекта'
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=16,
+        choices=STATUSES,
+        default=PENDING,
+        db_index=True
+    )
+    stage = models.PositiveSmallIntegerField(
+        verbose_name='Этап',
+        default=0
+    )
+    rows_deleted = models.PositiveBigIntegerField(
+        verbose_name='Удалено строк',
+        default=0
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Создано',
+        auto_now_add=True
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Обновлено',
+        auto_now=True
+    )
+    error = models.TextField(
+        verbose_name='Ошибка',
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'фоновое удаление'
+        verbose_name_plural = 'Фоновые удаления'
+        ordering = ('-created_at',)
+
+    def __str__(self):
+        return f'{self.get_target_display()} {self.object_id}'
+
+
+class RequestProfile(models.Model):
+    """
+    Профиль одного запроса, снятый по запросу сотрудника.
+    Сам профиль в формате pstats лежит в файле file_name
+    в каталоге PROFILING_DIR.
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name='Сотрудник',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='request_profiles'
+    )
+    method = models.CharField(
+        verbose_name='Метод',
+        max_length=16
+    )
+    path = models.CharField(
+        verbose_name='Адрес',
+        max_length=255
+    )
+    status = models.PositiveSmallIntegerField(
+        verbose_name='Код ответа'
+    )
+    duration = models.FloatField(
+        verbose_name='Длительность, с'
+    )
+    queries = models.PositiveIntegerField(
+        verbose_name='SQL-запросов'
+    )
+    file_name = models.CharField(
+        verbose_name='Файл профиля',
+        max_length=64,
+        unique=True
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Создано',
+        auto_now_add=True,
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = 'профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        ordering = ('-created_at',)
+
+    def __str__(self):
+        return f'{self.method} {self.path}'
+
+
+class SlowQuery(models.Model):
+    """
+    SQL-запрос дольше SLOW_QUERY_THRESHOLD с указанием представления,
+    действия DRF и поля сериализатора, во время которых он выполнен.
+    Таблица хранит SLOW_QUERY_LOG_SIZE последних записей.
+    """
+    created_at = models.DateTimeField(
+        verbose_name='Выполнен',
+        auto_now_add=True
+    )
+    duration = models.FloatField(
+        verbose_name='Длительность, с'
+    )
+    sql = models.TextField(
+        verbose_name='SQL'
+    )
+    params = models.JSONField(
+        verbose_name='Параметры',
+        default=list
+    )
+    view = models.CharField(
+        verbose_name='Представление',
+        max_length=128,
+        blank=True
+    )
+    action = models.CharField(
+        verbose_name='Действие',
+        max_length=64,
+        blank=True
+    )
+    serializer_field = models.CharField(
+        verbose_name='Поле сериализатора',
+        max_length=128,
+        blank=True
+    )
+    stack = models.TextField(
+        verbose_name='Стек вызовов',
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'медленный SQL-запрос'
+        verbose_name_plural = 'Медленные SQL-запросы'
+        ordering = ('-id',)
+
+    def __str__(self):
+        return f'{self.duration:.3f} с {self.sql[:60]}'
+
+
+class CatalogueVersion(models.Model):
+    """
+    Версия каталога рецептов, общая для всех процессов.
+    Входит в ключи кэша ответов и увеличивается при изменении
+    рецептов, тегов, ингредиентов и показываемых полей авторов.
+    """
+    version = models.PositiveBigIntegerField(
+        verbose_name='Версия',
+        default=1
+    )
+
+    class Meta:
+        verbose_name = 'версия каталога'
+        verbose_name_plural = 'Версии каталога'
+
+    def __str__(self):
+        return str(self.version)
@@ -4,6 +4,9 @@ from django.contrib.auth.forms import AuthenticationForm
 from django import forms
 
 from .models import ExtendedUser
+from reviews.admin import BackgroundDeletionMixin
+from reviews.deletion import schedule_user_deletion
+from reviews.paginator import EstimatedCountPaginator
 
 
 class EmailAdminAuthForm(AuthenticationForm):
@@ -16,10 +19,17 @@ class EmailAdminAuthForm(AuthenticationForm):
         return self.cleaned_data['username']
 
 
-class ExtendedUserAdmin(UserAdmin):
+class ExtendedUserAdmin(BackgroundDeletionMixin, UserAdmin):
     login_form = EmailAdminAuthForm
     list_display = ('email', 'first_name', 'last_name')
     ordering = ('email',)
+    search_fields = ('email__startswith', 'username__startswith')
+    search_help_text = 'Начало email или никнейма'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def schedule_deletion(self, obj):
+        schedule_user_deletion(obj)
 
 
 admin.site.register(ExtendedUser, ExtendedUserAdmin)